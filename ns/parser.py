@@ -1099,6 +1099,28 @@ class NodeReturn( Node ):
         else:
             return ParseError.fromToken('Expected an expression or `;`', token)
         
+class NodeYield( Node ):
+    value : Union[NodeExpression,None]
+    
+    def __init__( self, tokens:Tokens, i:int, parent:Node ):
+        super().__init__(tokens,i,parent)
+        self.value = None
+        self.tmp = False
+    
+    def feed( self, token:Token, ctx:ParseContext ) -> Union[ParseError,None]:
+        if type(token.t) == TokenEOF:
+            return ParseError.fromToken('Unexpected EOF', token)
+        if token.t == ';':
+            token.tag(self,'close')
+            ctx.node = self.parent
+        elif not self.tmp:
+            self.tmp = True
+            ctx.node = NodeExpression(self.tokens,ctx.ptr,self,';',True)
+            self.value = ctx.node
+            ctx.ptr -= 1
+        else:
+            return ParseError.fromToken('Expected an expression or `;`', token)
+        
 class NodeBreak( Node ):
     value : Union[NodeExpression,None]
     
@@ -1709,6 +1731,10 @@ class NodeBlock( Node ):
             ctx.node = NodeReturn(self.tokens,ctx.ptr,self)
             token.tag(ctx.node)
             self.children.append(ctx.node)
+        elif token.t == 'yield':
+            ctx.node = NodeYield(self.tokens,ctx.ptr,self)
+            token.tag(ctx.node)
+            self.children.append(ctx.node)
         elif token.t == 'break':
             ctx.node = NodeBreak(self.tokens,ctx.ptr,self)
             token.tag(ctx.node)
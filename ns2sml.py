@@ -1,16 +1,18 @@
 #!/usr/bin/env python3
-from typing import Union, Any, Callable, Type, Optional, TypeVar, Generic, Iterable
+from typing import Union, Any, Callable, Type, Optional, TypeVar, Generic, Iterable, Iterator, Generator
 
-import ns, sys, pathlib
+import ns, sys, os, pathlib, operator, array, functools, itertools, weakref, types, math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 args = sys.argv[1:]
 
 pathHere = pathlib.Path(__file__).parent
+searchPath = [pathHere] + [pathlib.Path(p) for p in os.environ.get('NS_PATH','').split(os.pathsep) if p]
 
-if len(args) == 0:
-    print('Missing source file')
-    exit(1)
-    
 frames_cache = {}
 
 def consume_ns_arg(arg:str) -> bool:
@@ -99,6 +101,41 @@ class RewindContinue(BaseException):
     def __init__(self, value: 'NSValue'):
         self.value = value
 
+class NSECompletion:
+    """
+    How the evaluation of a statement completed, stored in `NSEContext.completion`
+    
+    return / break / continue statements that only sit inside blocks and ifs up to their target
+    set it instead of raising, the other ones still fall back to the Rewind exceptions
+    """
+    
+    Normal   = 0
+    Return   = 1
+    Break    = 2
+    Continue = 3
+    
+    @staticmethod
+    def structured( node: ns.Node, through: tuple[type], target: tuple[type] ) -> bool:
+        try:
+            return node._nse_structured
+        except AttributeError:
+            parent = node.parent
+            while isinstance(parent,through):
+                parent = parent.parent
+            node._nse_structured = isinstance(parent,target)
+            return node._nse_structured
+    
+    @staticmethod
+    def loop( ctx: 'NSEContext' ) -> bool:
+        """
+        Settles the completion left by a loop body, returns whether the loop has to stop
+        """
+        if ctx.completion == NSECompletion.Return:
+            return True
+        stop = ctx.completion == NSECompletion.Break
+        ctx.completion = NSECompletion.Normal
+        return stop
+
 class FunctionException(BaseException):
     """
     Raised from a Python NSFunction to signal an error
@@ -166,6 +203,14 @@ class NSFunction:
     def call( self, ctx: 'NSEContext', frame: 'NSEFrame', args: Arguments ) -> 'NSValue':
         raise RuntimeError('That should not have happened')
     
+    def invoke( self, ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional['NSValue'], args: list['NSValue'], fn: Optional['NSValue'] = None ) -> 'NSValue':
+        """
+        Calls the function with positional arguments only, `fn` is the called value if the caller has it
+        """
+        if fn == None:
+            fn = NSValue({'__function':{'func':self,'bound':bound}},NSTypes.Function)
+        return self.call(ctx, frame, NSFunction.Arguments(args,{},fn,bound))
+    
 class NSFunctionNative(NSFunction):
     
     callback : Callable[['NSEContext',NSFunction.Arguments],'NSValue']
@@ -176,45 +221,205 @@ class NSFunctionNative(NSFunction):
         
     def call( self, ctx: 'NSEContext', frame: 'NSEFrame', args: NSFunction.Arguments ) -> 'NSValue':
         return NSValue.sanitize(self.callback(ctx,frame,args))
+    
+class NSFunctionFast(NSFunction):
+    """
+    Native function receiving its bound value and positional arguments directly,
+    it always has to return an NSValue, which is passed through as is
+    """
+    
+    callback : Callable[['NSEContext','NSEFrame',Optional['NSValue'],list['NSValue']],'NSValue']
+    
+    def __init__( self, callback: Callable[['NSEContext','NSEFrame',Optional['NSValue'],list['NSValue']],'NSValue'] ):
+        super().__init__()
+        self.callback = callback
+        
+    def call( self, ctx: 'NSEContext', frame: 'NSEFrame', args: NSFunction.Arguments ) -> 'NSValue':
+        return self.callback(ctx,frame,args.bound,args.args)
+    
+    def invoke( self, ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional['NSValue'], args: list['NSValue'], fn: Optional['NSValue'] = None ) -> 'NSValue':
+        return self.callback(ctx,frame,bound,args)
+        
+def walk( node: ns.Node, functions: bool = True ) -> Iterable[Union[ns.Node,ns.FunctionParameter]]:
+    """
+    Yields the given node and all the nodes below it, without entering nested functions if `functions` is False
+    """
+    stack = [node]
+    while len(stack):
+        n = stack.pop()
+        yield n
+        if n is not node and not functions and isinstance(n,ns.NodeFunction):
+            continue
+        children = [getattr(n,k,None) for k in getattr(type(n),'__annotations__',{})]
+        if isinstance(n,ns.DecoratableNode):
+            children.extend(n.get_decorators())
+        for c in children:
+            if isinstance(c,(ns.Node,ns.FunctionParameter)):
+                stack.append(c)
+            elif isinstance(c,list):
+                stack.extend(i for i in c if isinstance(i,(ns.Node,ns.FunctionParameter)))
+
+def declared( node: ns.Node ) -> frozenset[str]:
+    """
+    Names that executing the given node may bind in the scope it runs in, computed once per node
+    """
+    try:
+        return node._nse_declared
+    except AttributeError:
+        pass
+    names = set()
+    # Nested functions bind names in scopes of their own
+    for n in walk(node,False):
+        if isinstance(n,ns.NodeLet) or (isinstance(n,ns.NodeFunction) and n.name):
+            names.add(n.name)
+        elif isinstance(n,ns.NodeFor):
+            names.update(t.t for t in (n.name_it,n.name_i) if t != None)
+        elif isinstance(n,ns.NodeRefExpression):
+            names.update((n.name.t if n.name != None else 'it','self'))
+        elif isinstance(n,ns.NodeImport):
+            names.update(n.names)
+    names = node._nse_declared = frozenset(names)
+    return names
+
+class NSFunctionLayout:
+    """
+    How the arguments of a function are bound, computed once per function declaration
+    """
+    
+    names    : list[str]
+    index    : dict[str,int]
+    defaults : list[Optional[ns.NodeExpression]]
+    self     : bool
+    free     : tuple[str]
+    generator : bool
+    
+    __slots__ = ('names','index','defaults','self','free','generator')
+    
+    def __init__( self, func: ns.NodeFunction ):
+        self.names = [param.name for param in func.pararameters]
+        self.index = dict((name,i) for i, name in enumerate(self.names))
+        self.defaults = [param.default for param in func.pararameters]
+        self.self = any(
+            (isinstance(n,(ns.NodeName,ns.NodeDecorator)) and n.name == 'self') or
+            (isinstance(n,(ns.NodeAccessDot,ns.NodeAccessColon,ns.NodeAccessColonDouble)) and n.node == None)
+            for n in walk(func,False)
+        )
+        self.generator = any(isinstance(n,ns.NodeYield) for n in walk(func,False))
+        used = set()
+        for n in walk(func,False):
+            if isinstance(n,ns.NodeFunction) and n is not func:
+                # Parameters of nested functions are bound by them, only their own free names reach this one
+                used.update(NSFunctionLayout.of(n).free)
+            elif isinstance(n,(ns.NodeName,ns.NodeDecorator)):
+                used.add(n.name)
+            elif isinstance(n,(ns.NodeAccessDot,ns.NodeAccessColon,ns.NodeAccessColonDouble)) and n.node == None:
+                used.add('self')
+        used.difference_update(self.names)
+        if self.self:
+            used.discard('self')
+        self.free = tuple(used)
         
+    @staticmethod
+    def of( func: ns.NodeFunction ) -> 'NSFunctionLayout':
+        try:
+            return func._nse_layout
+        except AttributeError:
+            layout = func._nse_layout = NSFunctionLayout(func)
+            return layout
+
 class NSFunctionCode(NSFunction):
     
-    func  : ns.NodeFunction
-    frame : 'NSEFrame'
+    func   : ns.NodeFunction
+    frame  : 'NSEFrame'
+    layout : NSFunctionLayout
     
     def __init__( self, func: ns.NodeFunction, frame: 'NSEFrame' ):
         super().__init__()
         self.func = func
-        self.frame = frame
+        self.layout = NSFunctionLayout.of(func)
+        self.frame = self.capture(frame)
         
-    def call( self, ctx: 'NSEContext', frame: 'NSEFrame', args: NSFunction.Arguments ) -> 'NSValue':
-        mapping = dict((param.name,None) for param in self.func.pararameters)
-        for name, arg in args.kwargs.items():
-            if name in mapping:
-                mapping[name] = arg
-            else:
-                raise FunctionException('Argument %s does not exist in this function'%(name,))
-        for arg in args.args:
-            found = False
-            for name, val in mapping.items():
-                if val == None:
-                    mapping[name] = arg
-                    found = True
+    def capture( self, frame: 'NSEFrame' ) -> 'NSEFrame':
+        """
+        Keeps, for each free variable, the scopes of the defining frame that hold it or may still bind it
+        """
+        cells = {}
+        for name in self.layout.free:
+            kept = []
+            cell = None
+            scope = frame.vars
+            # Scopes skipped here can never bind the name, so looking it up through the kept ones finds the same value
+            while scope != None:
+                if isinstance(scope,NSECells):
+                    cell = scope.cells.get(name)
                     break
-            if not found:
-                raise FunctionException('Unexpected extra argument')
-        for name, val in mapping.items():
-            if val == None:
-                mapping[name] = NULL()
-        frame = self.frame(mapping)
-        frame.vars.new('self',args.bound or NULL())
+                if name in scope.vars or scope.parent == None:
+                    kept.append(scope)
+                    break
+                if scope.node == None or name in declared(scope.node):
+                    kept.append(scope)
+                scope = scope.parent
+            for scope in reversed(kept):
+                cell = scope.detach(cell)
+            cells[name] = cell
+        return NSEFrame(NSECells(cells))
+        
+    def call( self, ctx: 'NSEContext', frame: 'NSEFrame', args: NSFunction.Arguments ) -> 'NSValue':
+        return self.invoke(ctx, frame, args.bound, args.args, args.fn, args.kwargs)
+        
+    def invoke( self, ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional['NSValue'], args: list['NSValue'], fn: Optional['NSValue'] = None, kwargs: Optional[dict[str,'NSValue']] = None ) -> 'NSValue':
+        frame = self.enter(ctx, frame, bound, args, kwargs)
         if self.func.body == None:
             return NULL()
+        elif self.layout.generator:
+            return NSTypes.Stream.instantiate(ctx.generate(self.func.body,frame))
         else:
             try:
-                return ctx.exec(self.func.body,frame)
+                result = ctx.run(self.func.body,frame) if ctx.stack else ctx.exec(self.func.body,frame)
             except RewindReturn as ret:
                 return ret.value
+            ctx.completion = NSECompletion.Normal
+            return result
+        
+    def enter( self, ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional['NSValue'], args: list['NSValue'], kwargs: Optional[dict[str,'NSValue']] = None ) -> 'NSEFrame':
+        """
+        Binds the arguments and creates the frame the body is executed in
+        """
+        layout = self.layout
+        values = args
+        if kwargs:
+            # Keyword arguments take their slot first, positional ones then fill the remaining slots in order
+            values = [None]*len(layout.names)
+            for name, arg in kwargs.items():
+                i = layout.index.get(name)
+                if i == None:
+                    raise FunctionException('Argument %s does not exist in this function'%(name,))
+                values[i] = arg
+            free = (i for i, val in enumerate(values) if val == None)
+            for arg in args:
+                i = next(free,None)
+                if i == None:
+                    raise FunctionException('Unexpected extra argument')
+                values[i] = arg
+        elif len(values) > len(layout.names):
+            raise FunctionException('Unexpected extra argument')
+        mapping = {}
+        for name, val in zip(layout.names,values):
+            if val != None:
+                mapping[name] = util.bind(ctx, frame, val)
+        missing = len(mapping) < len(layout.names)
+        if missing:
+            for name in layout.names:
+                if name not in mapping:
+                    mapping[name] = util.own(ctx, frame, NULL())
+        if layout.self:
+            mapping['self'] = util.own(ctx, frame, bound or NULL())
+        frame = self.frame(mapping,self.func)
+        if missing:
+            for i, name in enumerate(layout.names):
+                if (i >= len(values) or values[i] == None) and layout.defaults[i] != None:
+                    mapping[name] = util.bind(ctx, frame, ctx.exec(layout.defaults[i],frame))
+        return frame
 
 class NSKind:
 
@@ -224,20 +429,119 @@ class NSKind:
     class Ref(): pass
 
 def impl_trait( target: 'NSValue', trait: 'NSValue' ):
-    if not isinstance(trait,NSValue) or trait.type != NSKind.Trait:
+    if not isinstance(trait,NSValue) or trait.type is not NSKind.Trait:
         raise TypeError('Trait argument has to be an NSValue Trait')
-    if not isinstance(target,NSValue) or target.type != NSKind.Class:
+    if not isinstance(target,NSValue) or target.type is not NSKind.Class:
         raise TypeError('Traits can only be applied on NSValue Class')
     def wrapper( impl ):
         cls = NSValue.make_class(impl)
         target.data['__class']['trait'][trait] = cls
+        NSValue.trait_version += 1
         return impl
     return wrapper
 
+class NSShape:
+    """
+    Property layout shared by all values that received the same properties in the same order
+    """
+    
+    index       : dict[str,int]
+    size        : int
+    transitions : 'weakref.WeakValueDictionary[str,NSShape]'
+    
+    __slots__ = ('index','size','transitions','__weakref__')
+    
+    root : 'NSShape'
+    
+    def __init__( self, index: Optional[dict[str,int]] = None, size: int = 0 ):
+        # The index dict is shared along a chain of transitions, only its first size entries belong to this shape
+        self.index = index if index != None else {}
+        self.size = size
+        self.transitions = weakref.WeakValueDictionary()
+        
+    def slot( self, prop: str ) -> Optional[int]:
+        i = self.index.get(prop)
+        return i if i != None and i < self.size else None
+    
+    def names( self ) -> Iterator[str]:
+        return itertools.islice(self.index, self.size)
+        
+    def add( self, prop: str ) -> 'NSShape':
+        shape = self.transitions.get(prop)
+        if shape == None:
+            index = self.index
+            if len(index) != self.size and index.get(prop) != self.size:
+                # A sibling already extended the shared index with another property
+                index = {name: i for i, name in enumerate(self.names())}
+            index[prop] = self.size
+            shape = self.transitions[prop] = NSShape(index, self.size + 1)
+        return shape
+    
+    @staticmethod
+    def of( props: dict ) -> 'NSShape':
+        shape = NSShape.root
+        for prop in props:
+            shape = shape.add(prop)
+        return shape
+    
+NSShape.root = NSShape()
+
+class NSRope:
+    """
+    String built by repeated concatenation, its pieces are only joined the first time it is read
+    """
+    
+    parts  : list[str]
+    count  : int
+    length : int
+    flat   : Optional[str]
+    
+    __slots__ = ('parts','count','length','flat')
+    
+    # Concatenations shorter than this are copied right away
+    threshold = 256
+    
+    def __init__( self, parts: list[str], length: int ):
+        self.parts = parts
+        self.count = len(parts)
+        self.length = length
+        self.flat = None
+        
+    def __str__( self ) -> str:
+        if self.flat == None:
+            self.flat = ''.join(self.parts if self.count == len(self.parts) else self.parts[:self.count])
+        return self.flat
+    
+    def __len__( self ) -> int:
+        return self.length
+    
+    @staticmethod
+    def concat( left: Union[str,'NSRope'], right: Union[str,'NSRope'] ) -> Union[str,'NSRope']:
+        right = str(right)
+        if type(left) is str:
+            if len(left)+len(right) < NSRope.threshold:
+                return left+right
+            return NSRope([left,right],len(left)+len(right))
+        if left.count == len(left.parts):
+            # Strings extending one another share their pieces
+            parts = left.parts
+        else:
+            # Another string already extended these pieces
+            parts = left.parts[:left.count]
+        parts.append(right)
+        return NSRope(parts,left.length+len(right))
+
 class NSValue:
     
-    type : Optional['NSValue']
-    data : dict
+    type  : Optional['NSValue']
+    data  : dict
+    shape : NSShape
+    slots : Optional[list['NSValue']]
+    owned : Union[bool,str]
+    
+    __slots__ = ('data','shape','slots','type','owned')
+    
+    POOLED = 'pooled'
     
     conversions = {
         str:   lambda v: NSValue.String(v),
@@ -250,6 +554,9 @@ class NSValue:
         Callable: lambda v: NSValue.Function(v)
     }
     
+    small_numbers : dict[float,'NSValue'] = {}
+    trait_version : int = 0
+    
     _late_types = []
     @staticmethod
     def _latetype():
@@ -267,28 +574,69 @@ class NSValue:
     
     def __init__( self, data: dict, type: Optional['NSValue'] = None, props: Optional[dict] = None ):
         self.data = data
-        self.props = props or {}
+        if props:
+            self.shape = NSShape.of(props)
+            self.slots = list(props.values())
+        else:
+            self.shape = NSShape.root
+            self.slots = None
         self.type = type
+        self.owned = False
+        
+    @property
+    def props( self ) -> Optional[types.MappingProxyType]:
+        # A read-only view, properties are changed through set
+        return types.MappingProxyType(dict(zip(self.shape.names(),self.slots))) if self.slots else None
+    
+    def lookup( self, prop: str ) -> Optional['NSValue']:
+        i = self.shape.slot(prop)
+        return self.slots[i] if i != None else None
         
     def get( self, prop: str, searchInstance: Optional[bool] = True, searchClass: Optional[bool] = False ) -> 'NSValue':
-        if self.type == NSKind.Null:
+        if self.type is NSKind.Null:
             return NULL()
-        if self.type == NSKind.Ref:
+        if self.type is NSKind.Ref:
             return self.data.get(prop, searchInstance, searchClass)
         if searchInstance:
-            return self.props.get(prop, NULL())
+            return self.lookup(prop) or NULL()
         if searchClass:
-            return self.type.props.get(prop, NULL())
+            return self.type.lookup(prop) or NULL()
         return NULL()
     
     S = TypeVar('S',bound='NSValue')
     def set( self, prop: str, value: S ) -> S:
-        if self.type == NSKind.Ref:
+        if self.type is NSKind.Ref:
             return self.data.set(prop, value)
         if self.type in (NSKind.Null,NSKind.Class,NSKind.Trait):
             pass
+        elif self.shape.slot(prop) != None:
+            self.slots[self.shape.slot(prop)] = value
         else:
-            self.props[prop] = value
+            size = self.shape.size
+            if self.slots == None:
+                self.slots = [value]
+            else:
+                if len(self.slots) != size:
+                    # Another value sharing these slots added its own properties
+                    self.slots = self.slots[:size]
+                self.slots.append(value)
+            self.shape = self.shape.add(prop)
+        return value
+        
+    @staticmethod
+    def constant( value: 'NSValue' ) -> 'NSValue':
+        """
+        Marks a value as shared, so that it gets copied before being stored anywhere
+        """
+        value.owned = True
+        return value
+    
+    @staticmethod
+    def pooled( value: 'NSValue' ) -> 'NSValue':
+        """
+        Marks an immutable primitive as pooled, variables share it while any other slot still gets a copy
+        """
+        value.owned = NSValue.POOLED
         return value
         
     @staticmethod
@@ -314,6 +662,8 @@ class NSValue:
             for p,v in pre.__dict__.items():
                 if p.startswith('_'): continue
                 props[p] = NSValue.sanitize(v)
+                if not props[p].owned:
+                    props[p].owned = True
         
         return NSValue({
             '__class' : {
@@ -331,22 +681,23 @@ class NSValue:
         
     @staticmethod
     def make_trait( target ):
-        if not isinstance(target,NSValue) or target.type != NSKind.Trait:
+        if not isinstance(target,NSValue) or target.type is not NSKind.Trait:
             raise TypeError('make_trait must be called with a trait')
         class wrapper:
             def __init__( self, trait ):
                 for m in target.data['methods']:
-                    if not hasattr(trait,m) or not callable(getattr(trait,m)):
+                    if not hasattr(trait,m) or not (callable(getattr(trait,m)) or isinstance(getattr(trait,m),NSValue)):
                         raise TypeError('Implementation is missing method %s'%(repr(m),))
                 self.trait = trait
             def __set_name__( self, owner, name ):
                 if not hasattr(owner,'__trait'):
                     setattr(owner,'__trait',{})
                 getattr(owner,'__trait')[target] = NSValue.make_class(self.trait)
+                NSValue.trait_version += 1
         return wrapper
     
     def instantiate( self, *args, **kwargs ) -> 'NSValue':
-        if self.type == NSKind.Class:
+        if self.type is NSKind.Class:
             val = NSValue({},self,{})
             cls = self.data['__class']['class']
             if hasattr(cls,'__init__'):
@@ -367,11 +718,11 @@ class NSValue:
         t = self.get_trait(trait)
         if not t:
             return None
-        return t.props.get(name,None)
+        return t.lookup(name)
     
     def get_trait_method( self, trait: 'NSValue', name: str ) -> Union[NSFunction,None]:
         attr = self.get_trait_attribute(trait,name)
-        if not attr or attr.type != NSTypes.Function:
+        if not attr or attr.type is not NSTypes.Function:
             return None
         return attr.data.get('__function',{}).get('func',None)
     
@@ -379,17 +730,25 @@ class NSValue:
     def Function( callback: Callable[['NSEContext','NSFunction.Arguments'],'NSValue'] ) -> 'NSValue':
         return NSValue._latevalue({'__function':{'func':NSFunctionNative(callback),'bound':None}},'NSTypes.Function')
     
+    @staticmethod
+    def Native( callback: Callable[['NSEContext','NSEFrame',Optional['NSValue'],list['NSValue']],'NSValue'] ) -> 'NSValue':
+        return NSValue._latevalue({'__function':{'func':NSFunctionFast(callback),'bound':None}},'NSTypes.Function')
+    
     @staticmethod
     def String( value: str ) -> 'NSValue':
         return NSValue._latevalue(value,'NSTypes.String')
     
     @staticmethod
     def Number( value: Union[int,float] ) -> 'NSValue':
-        return NSValue._latevalue(float(value),'NSTypes.Number')
+        value = float(value)
+        cached = NSValue.small_numbers.get(value)
+        if cached != None:
+            return cached
+        return NSValue._latevalue(value,'NSTypes.Number')
     
     @staticmethod
     def Boolean( value: Any ) -> 'NSValue':
-        return NSValue._latevalue(bool(value),'NSTypes.Boolean')
+        return TRUE() if value else FALSE()
     
     @staticmethod
     def Array( items: list['NSValue'] ) -> 'NSValue':
@@ -405,6 +764,9 @@ class NSTraits:
     
     ToString = NSValue.create_trait(('toString',))
     Iterator = NSValue.create_trait(('items',))
+    Stream = NSValue.create_trait(('stream',))
+    Index = NSValue.create_trait(('get','set','length'))
+    Hash = NSValue.create_trait(('hash',))
     Copy = NSValue.create_trait(('copy',))
 
     class Op:
@@ -414,6 +776,20 @@ class NSTraits:
         Mul = NSValue.create_trait(('mul',))
         Div = NSValue.create_trait(('div',))
         
+        AddAssign = NSValue.create_trait(('addAssign',))
+        SubAssign = NSValue.create_trait(('subAssign',))
+        MulAssign = NSValue.create_trait(('mulAssign',))
+        DivAssign = NSValue.create_trait(('divAssign',))
+        
+        Mod = NSValue.create_trait(('mod',))
+        
+        BitAnd = NSValue.create_trait(('bitAnd',))
+        BitOr = NSValue.create_trait(('bitOr',))
+        BitXor = NSValue.create_trait(('bitXor',))
+        BitNot = NSValue.create_trait(('bitNot',))
+        Shl = NSValue.create_trait(('shl',))
+        Shr = NSValue.create_trait(('shr',))
+        
         Inc = NSValue.create_trait(('inc',))
         Dec = NSValue.create_trait(('dec',))
         
@@ -421,31 +797,31 @@ class NSTraits:
         Gt = NSValue.create_trait(('gt',))
         Lt = NSValue.create_trait(('lt',))
     
-ellipsis = type[Ellipsis]
+ellipsis = type(Ellipsis)
         
-def _check_bound_to(args: 'NSFunction.Arguments', target: NSValue):
-    if not args.bound:
+def _check_bound_to(bound: Optional[NSValue], target: NSValue):
+    if not bound:
         raise FunctionException('Unbound method call')
-    elif args.bound.type != target:
+    elif bound.type is not target:
         raise FunctionException('Call to method bound to wrong type')
     
-def _check_called_with(args: 'NSFunction.Arguments', target: Union[tuple[Union[NSValue,ellipsis]],list[tuple[Union[NSValue,ellipsis]]]]):
+def _check_called_with(args: list[NSValue], target: Union[tuple[Union[NSValue,ellipsis]],list[tuple[Union[NSValue,ellipsis]]]]):
     target = [target] if isinstance(target, tuple) else target
     for alt in target:
         for i, t in enumerate(alt):
             if i+1 < len(alt) and isinstance(alt[i+1], ellipsis):
-                for j in range(i,len(args.args)):
-                    if args.args[j].type != t:
+                for j in range(i,len(args)):
+                    if args[j].type is not t:
                         raise FunctionException('TBD#1')
             else:
-                if i >= len(args.args):
+                if i >= len(args):
                     raise FunctionException('TBD#2')
-                elif args.args[i].type != t:
+                elif args[i].type is not t:
                     raise FunctionException('TBD#3')
                 
-def _check_args(args: 'NSFunction.Arguments', bound: NSValue = None, arguments: Union[tuple[Union[NSValue,ellipsis]],list[tuple[Union[NSValue,ellipsis]]]] = None):
-    if bound != None: 
-        _check_bound_to(args, bound)
+def _check_args(bound: Optional[NSValue], args: list[NSValue], target: NSValue = None, arguments: Union[tuple[Union[NSValue,ellipsis]],list[tuple[Union[NSValue,ellipsis]]]] = None):
+    if target != None: 
+        _check_bound_to(bound, target)
     if arguments != None: 
         _check_called_with(args, arguments)
         
@@ -454,36 +830,464 @@ class util:
     @staticmethod
     def assign_ref(target: NSValue, value: NSValue):
         target.data = value.data
-        target.props = value.props
+        target.shape = value.shape
+        # Both values may add properties of their own later on, so they don't share the list
+        target.slots = list(value.slots) if value.slots != None else None
         target.type = value.type
         
     @staticmethod
     def copy(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue):
-        if value.type == NSKind.Null:
-            return NULL()
+        if value.type is NSKind.Null:
+            return NSValue(None,NSKind.Null)
         copy = value.get_trait_method(NSTraits.Copy, 'copy')
-        return copy.call(ctx, frame, NSFunction.Arguments([],{},copy,value)) if copy else value
+        return copy.invoke(ctx, frame, value, []) if copy else value
+    
+    @staticmethod
+    def callback(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue) -> Callable[[list[NSValue]],NSValue]:
+        """
+        Unpacks a function value once so that it can be invoked repeatedly
+        """
+        f = value.data['__function'].get('func',None) if value.type is NSTypes.Function else None
+        if not isinstance(f,NSFunction):
+            raise FunctionException('Expected a function')
+        bound = value.data['__function'].get('bound',None)
+        return lambda args: f.invoke(ctx, frame, bound, args, value)
+    
+    @staticmethod
+    def comparator(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue) -> Callable[[NSValue,NSValue],float]:
+        """
+        Comparison function calling a user function that returns a negative, zero or positive number
+        """
+        f = util.callback(ctx, frame, value)
+        def compare( a: NSValue, b: NSValue ) -> float:
+            result = f([a, b])
+            if result.type is not NSTypes.Number:
+                raise FunctionException('Comparator has to return a number')
+            return result.data
+        return compare
+    
+    @staticmethod
+    def numbers(items: list[NSValue]) -> list[Union[int,float]]:
+        for item in items:
+            if item.type is not NSTypes.Number:
+                raise FunctionException('Expected an array of numbers')
+        return [item.data for item in items]
+    
+    @staticmethod
+    def sort_key(items: list[NSValue]) -> Callable[[NSValue],Any]:
+        """
+        Compares the plain values of an array holding only numbers or only strings
+        """
+        if all(item.type is NSTypes.Number for item in items):
+            return lambda item: item.data
+        if all(item.type is NSTypes.String for item in items):
+            return lambda item: str(item.data)
+        raise FunctionException('Only arrays of numbers or of strings can be compared without a function')
+    
+    @staticmethod
+    def offset(key: NSValue, size: int) -> int:
+        """
+        Position designated by an index into a sequence of the given size, negative indices count from the end
+        """
+        if key.type is not NSTypes.Number or not math.isfinite(key.data) or int(key.data) != key.data:
+            raise FunctionException('Index has to be an integer')
+        i = int(key.data)
+        if not -size <= i < size:
+            raise FunctionException('Index out of range')
+        return i if i >= 0 else i+size
+    
+    @staticmethod
+    def key(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue) -> tuple:
+        """
+        Hashable identity of a map key, values other than primitives need a Hash trait
+        """
+        t = value.type
+        if t is NSTypes.Number or t is NSTypes.Boolean:
+            return (t, value.data)
+        elif t is NSTypes.String:
+            return (t, str(value.data))
+        elif t is NSKind.Null:
+            return (t, None)
+        method = value.get_trait_method(NSTraits.Hash, 'hash')
+        if not method:
+            raise FunctionException('Value can not be used as a key, it does not implement Hash')
+        result = method.invoke(ctx, frame, value, [])
+        if result.type is not NSTypes.Number and result.type is not NSTypes.String and result.type is not NSTypes.Boolean:
+            raise FunctionException('Expected hash to return a number, a string or a boolean')
+        return (t, util.key(ctx, frame, result))
+    
+    @staticmethod
+    def length(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue) -> int:
+        if value.type is NSTypes.Array:
+            return len(value.data['items'])
+        elif value.type is NSTypes.String:
+            return len(value.data)
+        method = value.get_trait_method(NSTraits.Index, 'length')
+        if not method:
+            raise FunctionException('Value is not indexable')
+        result = method.invoke(ctx, frame, value, [])
+        if result.type is not NSTypes.Number or not math.isfinite(result.data) or int(result.data) != result.data:
+            raise FunctionException('Expected length to return an integer')
+        return int(result.data)
+    
+    @staticmethod
+    def index(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue, key: NSValue) -> NSValue:
+        """
+        Reads an element of an array, a string or a value implementing the Index trait
+        """
+        if value.type is NSTypes.Array:
+            items = value.data['items']
+            return items[util.offset(key, len(items))]
+        elif value.type is NSTypes.String:
+            string = str(value.data)
+            return NSValue.String(string[util.offset(key, len(string))])
+        elif value.type is NSTypes.Map:
+            entry = value.data['entries'].get(util.key(ctx, frame, key))
+            return entry[1] if entry != None else NULL()
+        method = value.get_trait_method(NSTraits.Index, 'get')
+        if not method:
+            raise FunctionException('Value is not indexable')
+        return method.invoke(ctx, frame, value, [key])
+    
+    @staticmethod
+    def index_assign(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue, key: NSValue, item: NSValue):
+        if value.type is NSTypes.Array:
+            items = value.data['items']
+            items[util.offset(key, len(items))] = item
+            return
+        elif value.type is NSTypes.String:
+            raise FunctionException('Strings can not be modified through an index')
+        elif value.type is NSTypes.Map:
+            value.data['entries'][util.key(ctx, frame, key)] = (util.own(ctx, frame, key), item)
+            return
+        method = value.get_trait_method(NSTraits.Index, 'set')
+        if not method:
+            raise FunctionException('Value is not indexable')
+        method.invoke(ctx, frame, value, [key, item])
+    
+    @staticmethod
+    def slice(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue, bounds: list[NSValue]) -> NSValue:
+        """
+        View over a range of elements, sharing the storage of the sliced value
+        """
+        if len(bounds) > 3:
+            raise FunctionException('Expected at most a start, a stop and a step')
+        parts = [None, None, None]
+        for i, bound in enumerate(bounds):
+            if bound.type is NSKind.Null:
+                continue
+            if bound.type is not NSTypes.Number or not math.isfinite(bound.data) or int(bound.data) != bound.data:
+                raise FunctionException('Slice bounds have to be integers')
+            parts[i] = int(bound.data)
+        if parts[2] == 0:
+            raise FunctionException('Slice step can not be zero')
+        if value.type is NSTypes.String:
+            # Strings are immutable, so a slice of one is simply a shorter String
+            return NSValue.String(str(value.data)[slice(*parts)])
+        if value.type is NSTypes.Slice:
+            # Slicing a view narrows its range instead of stacking views
+            return NSTypes.Slice.instantiate(value.data['source'], value.data['range'][slice(*parts)])
+        return NSTypes.Slice.instantiate(value, range(util.length(ctx, frame, value))[slice(*parts)])
+    
+    @staticmethod
+    def view(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue) -> Iterator[NSValue]:
+        """
+        Iterates over the elements seen through a slice
+        """
+        source = value.data['source']
+        # The source may have shrunk since the slice was taken, so each position is checked again
+        return (util.index(ctx, frame, source, NSValue.Number(i)) for i in value.data['range'])
+    
+    @staticmethod
+    def modulo(a: Union[int,float], b: Union[int,float]) -> Union[int,float]:
+        if b == 0:
+            raise FunctionException('Modulo by zero')
+        return a % b
+    
+    @staticmethod
+    def shift(count: Union[int,float], limit: Optional[int] = None) -> int:
+        """
+        Shift count of `<<` or `>>`, left shifts are bounded so that their result stays a reasonable number
+        """
+        count = util.integer(count)
+        if count < 0:
+            raise FunctionException('Negative shift count')
+        if limit != None and count > limit:
+            raise FunctionException('Shift count can not exceed %d'%(limit,))
+        return count
+    
+    @staticmethod
+    def integer(value: Union[int,float]) -> int:
+        """
+        Plain integer held by a Number, for the operations that are only defined on integers
+        """
+        if not math.isfinite(value) or int(value) != value:
+            raise FunctionException('Expected an integer')
+        return int(value)
+    
+    @staticmethod
+    def resolve(value: NSValue) -> NSValue:
+        """
+        Executes a lazily imported module the first time one of its members is used
+        """
+        if value.data != None:
+            module = load_module(value.data['path'], import_module)
+            value.data, value.shape, value.slots = None, module.shape, module.slots
+        return value
+        
+    @staticmethod
+    def own(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue):
+        """
+        Prepares a value to be stored in a slot, copying it only if another slot already holds it
+        """
+        if value.owned:
+            value = util.copy(ctx, frame, value)
+        value.owned = True
+        return value
+    
+    @staticmethod
+    def bind(ctx: 'NSEContext', frame: 'NSEFrame', value: NSValue):
+        """
+        Prepares a value to be stored in a variable, pooled primitives are shared until a reference pins one
+        """
+        if value.owned is NSValue.POOLED:
+            return value
+        return util.own(ctx, frame, value)
 
 def assign(node: ns.Node, value: NSValue, frame: 'NSEFrame', ctx: 'NSEContext'):
     if isinstance(node, ns.NodeName):
-        frame.vars.set(node.name, value)
+        frame.vars.set(node.name, util.bind(ctx, frame, value))
         return
     elif isinstance(node, ns.NodeAccessDot):
-        ctx.exec(node.node,frame).set(node.prop, value)
+        # Copyable values can't hold properties of their own, so the property lands on a temporary copy
+        target = util.copy(ctx, frame, ctx.exec(node.node,frame))
+        cached = getattr(node, '_nse_shape', None)
+        if cached != None and target.shape is cached[0]:
+            target.slots[cached[1]] = util.own(ctx, frame, value)
+            return
+        if target.type is NSTypes.Module:
+            util.resolve(target)
+        target.set(node.prop, util.own(ctx, frame, value))
+        slot = target.shape.slot(node.prop) if target.type is not NSKind.Class and target.type is not NSKind.Trait else None
+        if slot != None:
+            node._nse_shape = (target.shape, slot)
         return
     elif isinstance(node, ns.NodeOperatorPrefix) and node.op.t == '*':
-        target = ctx.exec(node.value, frame, False)
-        if target.type != NSKind.Ref:
+        target = ctx.exec(node.value, frame)
+        if target.type is not NSKind.Ref:
             raise NSEException.fromToken('Can\'t dereference `%s`'%(toNSString(ctx,frame,value.type),),node.op)
         util.assign_ref(target.data,value)
         return
+    elif isinstance(node, ns.NodeIndex):
+        target = ctx.exec(node.value, frame)
+        if node.sep != None or len(node.index) != 1:
+            raise NSEException.fromNode('Only single indices can be assigned to',node)
+        key = ctx.exec(node.index[0], frame)
+        try:
+            util.index_assign(ctx, frame, target, key, util.own(ctx, frame, value))
+        except FunctionException as error:
+            raise NSEException.fromNode(error.message or '',node)
+        return
     elif isinstance(node, ns.NodeExpression):
         assign(node.expression, value, frame, ctx)
         return
     raise NSEException.fromNode('Assignment to \'%s\' is not currently supported'%(type(node).__name__,),node)
 
+def reference(node: ns.Node, frame: 'NSEFrame', ctx: 'NSEContext') -> NSValue:
+    value = ctx.exec(node, frame)
+    # Only names, properties and dereferences point to a slot, anything else gets referenced through its own copy
+    if value is not NULL() and (isinstance(node, (ns.NodeName, ns.NodeAccessDot, ns.NodeAccessColonDouble)) or (isinstance(node, ns.NodeOperatorPrefix) and node.op.t == '*')):
+        if value.owned is NSValue.POOLED:
+            # Variables share pooled primitives, so the referenced one gets a copy of its own first
+            value = util.copy(ctx, frame, value)
+            if isinstance(node, ns.NodeName):
+                frame.vars.set(node.name, value)
+        value.owned = True
+    else:
+        value = util.own(ctx, frame, value)
+    return NSValue(value, NSKind.Ref)
+
 # TODO: Implement constructor for all of them
 
+def typed_array( name: str, code: str ) -> NSValue:
+    """
+    Creates an array class storing plain numbers contiguously, elements are only boxed when they are read
+    """
+    
+    # Integer reductions in numpy wrap around on overflow, only floats go through it
+    vectorized = numpy != None and code == 'd'
+    bits = array.array(code).itemsize * 8
+    low, high = (-(1 << bits-1), (1 << bits-1) - 1) if code.islower() else (0, (1 << bits) - 1)
+    
+    def unbox( value: NSValue ) -> Union[int,float]:
+        if value.type is not NSTypes.Number:
+            raise FunctionException('%s only holds numbers'%(name,))
+        if code == 'd':
+            return float(value.data)
+        if not math.isfinite(value.data) or int(value.data) != value.data:
+            raise FunctionException('%s only holds integers'%(name,))
+        if not low <= int(value.data) <= high:
+            raise FunctionException('%s only holds integers between %d and %d'%(name,low,high))
+        return int(value.data)
+    
+    def index( buffer: array.array, value: NSValue ) -> int:
+        return util.offset(value, len(buffer))
+    
+    class TypedArray:
+        def __init__( self: NSValue, items: Iterable[Union[int,float]] = () ):
+            self.data['buffer'] = array.array(code,items)
+        
+        @NSValue.Native
+        def push( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls)
+            bound.data['buffer'].extend(unbox(arg) for arg in args)
+            return NULL()
+        
+        @NSValue.Native
+        def pop( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, ())
+            buffer = bound.data['buffer']
+            return NSValue.Number(buffer.pop()) if len(buffer) else NULL()
+        
+        @NSValue.Native
+        def get( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, (NSTypes.Number,))
+            buffer = bound.data['buffer']
+            return NSValue.Number(buffer[index(buffer,args[0])])
+        
+        @NSValue.Native
+        def set( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, (NSTypes.Number,NSTypes.Number))
+            buffer = bound.data['buffer']
+            buffer[index(buffer,args[0])] = unbox(args[1])
+            return NULL()
+        
+        @NSValue.Native
+        def length( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, ())
+            return NSValue.Number(len(bound.data['buffer']))
+        
+        @NSValue.Native
+        def map( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, (NSTypes.Function,))
+            f = util.callback(ctx, frame, args[0])
+            return cls.instantiate(unbox(f([NSValue.Number(v)])) for v in bound.data['buffer'])
+        
+        @NSValue.Native
+        def filter( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, (NSTypes.Function,))
+            f = util.callback(ctx, frame, args[0])
+            return cls.instantiate(v for v in bound.data['buffer'] if NSEExecutors.truthy(f([NSValue.Number(v)])))
+        
+        @NSValue.Native
+        def reduce( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls)
+            if len(args) not in (1,2):
+                raise FunctionException('Expected a function and an optional initial value')
+            f = util.callback(ctx, frame, args[0])
+            items = iter(bound.data['buffer'])
+            acc = args[1] if len(args) == 2 else NSValue.Number(next(items)) if len(bound.data['buffer']) else NULL()
+            for v in items:
+                acc = f([acc, NSValue.Number(v)])
+            return acc
+        
+        @NSValue.Native
+        def sum( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, ())
+            buffer = bound.data['buffer']
+            if vectorized and len(buffer):
+                return NSValue.Number(numpy.frombuffer(buffer, dtype=code).sum().item())
+            return NSValue.Number(sum(buffer))
+        
+        @NSValue.Native
+        def min( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, ())
+            buffer = bound.data['buffer']
+            return NSValue.Number(min(buffer)) if len(buffer) else NULL()
+        
+        @NSValue.Native
+        def max( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls, ())
+            buffer = bound.data['buffer']
+            return NSValue.Number(max(buffer)) if len(buffer) else NULL()
+        
+        @NSValue.Native
+        def sort( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls)
+            buffer = bound.data['buffer']
+            if len(args) == 0:
+                buffer[:] = array.array(code, sorted(buffer))
+                return bound
+            # A comparator needs boxed elements, so this is the slow path
+            compare = util.comparator(ctx, frame, args[0])
+            buffer[:] = array.array(code, sorted(buffer, key=functools.cmp_to_key(lambda a, b: compare(NSValue.Number(a), NSValue.Number(b)))))
+            return bound
+        
+        @NSValue.Native
+        def dot( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, cls)
+            if len(args) != 1 or args[0].type is not cls:
+                raise FunctionException('Expected a %s'%(name,))
+            a, b = bound.data['buffer'], args[0].data['buffer']
+            if len(a) != len(b):
+                raise FunctionException('Arrays have different lengths')
+            if vectorized and len(a):
+                return NSValue.Number(numpy.dot(numpy.frombuffer(a, dtype=code), numpy.frombuffer(b, dtype=code)).item())
+            return NSValue.Number(sum(map(operator.mul, a, b)))
+        
+        @NSValue.make_trait(NSTraits.Iterator)
+        class __trait__Iterator:
+            @NSValue.Native
+            def items( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, cls, ())
+                return NSValue.Array([NSValue.Number(v) for v in bound.data['buffer']])
+        
+        @NSValue.make_trait(NSTraits.Stream)
+        class __trait__Stream:
+            @NSValue.Native
+            def stream( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, cls, ())
+                return NSTypes.Stream.instantiate(map(NSValue.Number, bound.data['buffer']))
+        
+        @NSValue.make_trait(NSTraits.Index)
+        class __trait__Index:
+            @NSValue.Native
+            def get( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, cls, (NSTypes.Number,))
+                buffer = bound.data['buffer']
+                return NSValue.Number(buffer[index(buffer,args[0])])
+            
+            @NSValue.Native
+            def set( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, cls)
+                if len(args) != 2:
+                    raise FunctionException('Expected an index and a value')
+                buffer = bound.data['buffer']
+                buffer[index(buffer,args[0])] = unbox(args[1])
+                return NULL()
+            
+            @NSValue.Native
+            def length( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, cls, ())
+                return NSValue.Number(len(bound.data['buffer']))
+        
+        @NSValue.make_trait(NSTraits.ToString)
+        class __trait__ToString:
+            @NSValue.Native
+            def toString( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, cls, ())
+                return NSValue.String('['+', '.join(toNSString(ctx,frame,NSValue.Number(v)) for v in bound.data['buffer'])+']')
+            
+    @NSValue.Native
+    def create( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+        items = args[0].data['items'] if len(args) == 1 and args[0].type is NSTypes.Array else args
+        return cls.instantiate([unbox(item) for item in items])
+    
+    TypedArray.__name__ = TypedArray.__qualname__ = name
+    cls = NSValue.make_class(TypedArray)
+    cls.data['__class']['create'] = create
+    return cls
+
 class NSTypes:
     @NSValue.make_class
     class Module:
@@ -493,162 +1297,407 @@ class NSTypes:
     class Function:
         @NSValue.make_trait(NSTraits.Copy)
         class __trait_Copy:
-            def copy(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Function, ())
-                return NSValue(args.bound.data,args.bound.type)
+            @NSValue.Native
+            def copy( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Function, ())
+                return NSValue(bound.data,bound.type)
         
-        def bind(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments') -> NSValue:
-            _check_args(args, NSTypes.Function)
-            f = args.bound
-            b = args.args[0] if len(args) > 0 else NULL()
-            return NSValue({'__function':{'func':f.data['__function'].get('func',None),'bound':b}},f.type,f.props|{'bound':b})
+        @NSValue.Native
+        def bind( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Function)
+            f = bound
+            b = args[0] if len(args) > 0 else NULL()
+            return NSValue({'__function':{'func':f.data['__function'].get('func',None),'bound':b}},f.type,(f.props or {})|{'bound':b})
 
     @NSValue.make_class
     class String:
         @NSValue.make_trait(NSTraits.Copy)
         class __trait__Copy:
-            def copy(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.String, ())
-                return NSValue.String(args.bound.data)
+            @NSValue.Native
+            def copy( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.String, ())
+                return NSValue.String(str(bound.data))
         
         @NSValue.make_trait(NSTraits.Op.Add)
         class __trait__Add:
-            def add(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.String, (NSTypes.String,))
-                other, = args.args
-                return NSValue.String(args.bound.data+other.data)
+            @NSValue.Native
+            def add( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.String, (NSTypes.String,))
+                other, = args
+                return NSValue.String(NSRope.concat(bound.data,other.data))
             
         @NSValue.make_trait(NSTraits.Op.Mul)
         class __trait__Mul:
-            def mul(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.String, (NSTypes.Number,))
-                other, = args.args
-                return NSValue.String(args.bound.data*other.data)
+            @NSValue.Native
+            def mul( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.String, (NSTypes.Number,))
+                other, = args
+                return NSValue.String(str(bound.data)*other.data)
 
         @NSValue.make_trait(NSTraits.Op.Lt)
         class __trait__Lt:
-            def lt(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.String, (NSTypes.String,))
-                other, = args.args
-                return TRUE() if args.bound.data<other.data else FALSE()
+            @NSValue.Native
+            def lt( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.String, (NSTypes.String,))
+                other, = args
+                return TRUE() if str(bound.data)<str(other.data) else FALSE()
             
         @NSValue.make_trait(NSTraits.Op.Gt)
         class __trait__Gt:
-            def gt(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.String, (NSTypes.String,))
-                other, = args.args
-                return TRUE() if args.bound.data>other.data else FALSE()
+            @NSValue.Native
+            def gt( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.String, (NSTypes.String,))
+                other, = args
+                return TRUE() if str(bound.data)>str(other.data) else FALSE()
             
         @NSValue.make_trait(NSTraits.Op.Eq)
         class __trait__Eq:
-            def eq(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.String, (NSTypes.String,))
-                other, = args.args
-                return TRUE() if args.bound.data==other.data else FALSE()
+            @NSValue.Native
+            def eq( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.String, (NSTypes.String,))
+                other, = args
+                return TRUE() if str(bound.data)==str(other.data) else FALSE()
 
         @NSValue.make_trait(NSTraits.Op.Dec)
         class __trait__Dec:
-            def dec(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.String, ())
-                return NSValue.String(args.bound.data[:-1])
+            @NSValue.Native
+            def dec( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.String, ())
+                return NSValue.String(str(bound.data)[:-1])
 
     @NSValue.make_class
     class Number:
         @NSValue.make_trait(NSTraits.Copy)
         class __trait__Copy:
-            def copy(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, ())
-                return NSValue.Number(args.bound.data)
+            @NSValue.Native
+            def copy( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, ())
+                return NSValue(bound.data,NSTypes.Number)
         
         @NSValue.make_trait(NSTraits.Op.Lt)
         class __trait__Lt:
-            def lt(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, (NSTypes.Number,))
-                other, = args.args
-                return TRUE() if args.bound.data<other.data else FALSE()
+            @NSValue.Native
+            def lt( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, (NSTypes.Number,))
+                other, = args
+                return TRUE() if bound.data<other.data else FALSE()
             
         @NSValue.make_trait(NSTraits.Op.Gt)
         class __trait__Gt:
-            def gt(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, (NSTypes.Number,))
-                other, = args.args
-                return TRUE() if args.bound.data>other.data else FALSE()
+            @NSValue.Native
+            def gt( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, (NSTypes.Number,))
+                other, = args
+                return TRUE() if bound.data>other.data else FALSE()
             
         @NSValue.make_trait(NSTraits.Op.Add)
         class __trait__Add:
-            def add(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, (NSTypes.Number,))
-                other, = args.args
-                return NSValue.Number(args.bound.data+other.data)
+            @NSValue.Native
+            def add( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, (NSTypes.Number,))
+                other, = args
+                return NSValue.Number(bound.data+other.data)
             
         @NSValue.make_trait(NSTraits.Op.Sub)
         class __trait__Sub:
-            def sub(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, (NSTypes.Number,))
-                other, = args.args
-                return NSValue.Number(args.bound.data-other.data)
+            @NSValue.Native
+            def sub( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, (NSTypes.Number,))
+                other, = args
+                return NSValue.Number(bound.data-other.data)
 
         @NSValue.make_trait(NSTraits.Op.Mul)
         class __trait__Mul:
-            def mul(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, (NSTypes.Number,))
-                other, = args.args
-                return NSValue.Number(args.bound.data*other.data)
+            @NSValue.Native
+            def mul( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, (NSTypes.Number,))
+                other, = args
+                return NSValue.Number(bound.data*other.data)
             
         @NSValue.make_trait(NSTraits.Op.Div)
         class __trait__Div:
-            def div(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, (NSTypes.Number,))
-                other, = args.args
-                return NSValue.Number(args.bound.data/other.data)
+            @NSValue.Native
+            def div( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, (NSTypes.Number,))
+                other, = args
+                return NSValue.Number(bound.data/other.data)
 
         @NSValue.make_trait(NSTraits.Op.Eq)
         class __trait__Eq:
-            def eq(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, (NSTypes.Number,))
-                other, = args.args
-                return NSValue.Boolean(args.bound.data==other.data)
+            @NSValue.Native
+            def eq( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, (NSTypes.Number,))
+                other, = args
+                return NSValue.Boolean(bound.data==other.data)
             
         @NSValue.make_trait(NSTraits.Op.Inc)
         class __trait__Inc:
-            def inc(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, ())
-                return NSValue.Number(args.bound.data+1)
+            @NSValue.Native
+            def inc( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, ())
+                return NSValue.Number(bound.data+1)
             
         @NSValue.make_trait(NSTraits.Op.Dec)
         class __trait__Dec:
-            def dec(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Number, ())
-                return NSValue.Number(args.bound.data-1)
+            @NSValue.Native
+            def dec( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Number, ())
+                return NSValue.Number(bound.data-1)
             
     @NSValue.make_class
     class Array:
         def __init__( self: NSValue ):
             pass
         
-        def push( ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments' ) -> NSValue:
-            _check_args(args, NSTypes.Array)
-            args.bound.data['items'].append(args.args[0] if len(args.args) >= 1 else NULL())
+        @NSValue.Native
+        def push( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array)
+            bound.data['items'].append(util.own(ctx, frame, args[0] if len(args) >= 1 else NULL()))
             return NULL()
         
-        def pop( ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments' ) -> NSValue:
-            _check_args(args, NSTypes.Array, ())
-            return args.bound.data['items'].pop() if len(args.bound.data['items']) else NULL()
+        @NSValue.Native
+        def pop( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array, ())
+            return bound.data['items'].pop() if len(bound.data['items']) else NULL()
+        
+        @NSValue.Native
+        def map( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array, (NSTypes.Function,))
+            f = util.callback(ctx, frame, args[0])
+            return NSValue.Array([util.own(ctx, frame, f([item])) for item in bound.data['items']])
+        
+        @NSValue.Native
+        def filter( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array, (NSTypes.Function,))
+            f = util.callback(ctx, frame, args[0])
+            return NSValue.Array([util.own(ctx, frame, item) for item in bound.data['items'] if NSEExecutors.truthy(f([item]))])
+        
+        @NSValue.Native
+        def reduce( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array)
+            if len(args) not in (1,2):
+                raise FunctionException('Expected a function and an optional initial value')
+            f = util.callback(ctx, frame, args[0])
+            items = iter(bound.data['items'])
+            acc = args[1] if len(args) == 2 else next(items, NULL())
+            for item in items:
+                acc = f([acc, item])
+            return acc
+        
+        @NSValue.Native
+        def sum( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array, ())
+            return NSValue.Number(sum(util.numbers(bound.data['items'])))
+        
+        @NSValue.Native
+        def min( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array, ())
+            items = bound.data['items']
+            return min(items, key=util.sort_key(items)) if len(items) else NULL()
+        
+        @NSValue.Native
+        def max( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array, ())
+            items = bound.data['items']
+            return max(items, key=util.sort_key(items)) if len(items) else NULL()
+        
+        @NSValue.Native
+        def sort( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array)
+            items = bound.data['items']
+            if len(args) == 0:
+                items.sort(key=util.sort_key(items))
+                return bound
+            items.sort(key=functools.cmp_to_key(util.comparator(ctx, frame, args[0])))
+            return bound
+        
+        @NSValue.Native
+        def dot( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array, (NSTypes.Array,))
+            a, b = util.numbers(bound.data['items']), util.numbers(args[0].data['items'])
+            if len(a) != len(b):
+                raise FunctionException('Arrays have different lengths')
+            return NSValue.Number(sum(map(operator.mul, a, b)))
+        
+        @NSValue.Native
+        def join( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Array)
+            if len(args) > 1 or (len(args) and args[0].type is not NSTypes.String):
+                raise FunctionException('Expected an optional string separator')
+            items = bound.data['items']
+            if any(item.type is not NSTypes.String for item in items):
+                raise FunctionException('Expected an array of strings')
+            separator = str(args[0].data) if len(args) else ''
+            return NSValue.String(separator.join(str(item.data) for item in items))
         
         @NSValue.make_trait(NSTraits.Op.Add)
         class __trait__Add:
-            def add(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Array, (NSTypes.Array,))
-                other, = args.args
-                return NSValue.Array(args.bound.data['items']+other.data['items'])
+            @NSValue.Native
+            def add( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Array, (NSTypes.Array,))
+                other, = args
+                return NSValue.Array(bound.data['items']+other.data['items'])
+            
+        @NSValue.make_trait(NSTraits.Op.AddAssign)
+        class __trait__AddAssign:
+            @NSValue.Native
+            def addAssign( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Array, (NSTypes.Array,))
+                other, = args
+                bound.data['items'].extend([util.own(ctx, frame, item) for item in other.data['items']])
+                return bound
+                
+    @NSValue.make_class
+    class Slice:
+        def __init__( self: NSValue, source: NSValue, indices: range ):
+            self.data['source'] = source
+            self.data['range'] = indices
+        
+        @NSValue.Native
+        def length( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Slice, ())
+            return NSValue.Number(len(bound.data['range']))
+        
+        @NSValue.Native
+        def toArray( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Slice, ())
+            return NSValue.Array([util.own(ctx, frame, item) for item in util.view(ctx, frame, bound)])
+        
+        @NSValue.make_trait(NSTraits.Index)
+        class __trait__Index:
+            @NSValue.Native
+            def get( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Slice, (NSTypes.Number,))
+                indices = bound.data['range']
+                return util.index(ctx, frame, bound.data['source'], NSValue.Number(indices[util.offset(args[0], len(indices))]))
+            
+            @NSValue.Native
+            def set( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Slice)
+                if len(args) != 2:
+                    raise FunctionException('Expected an index and a value')
+                indices = bound.data['range']
+                util.index_assign(ctx, frame, bound.data['source'], NSValue.Number(indices[util.offset(args[0], len(indices))]), args[1])
+                return NULL()
+            
+            @NSValue.Native
+            def length( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Slice, ())
+                return NSValue.Number(len(bound.data['range']))
+        
+        @NSValue.make_trait(NSTraits.Stream)
+        class __trait__Stream:
+            @NSValue.Native
+            def stream( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Slice, ())
+                return NSTypes.Stream.instantiate(util.view(ctx, frame, bound))
+        
+        @NSValue.make_trait(NSTraits.ToString)
+        class __trait__ToString:
+            @NSValue.Native
+            def toString( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Slice, ())
+                return NSValue.String('['+', '.join(toNSString(ctx,frame,item,rep=True) for item in util.view(ctx, frame, bound))+']')
+    
+    @NSValue.make_class
+    class Stream:
+        def __init__( self: NSValue, items: Iterator[NSValue] ):
+            self.data['iter'] = items
+        
+        @NSValue.Native
+        def next( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Stream, ())
+            return next(bound.data['iter'], NULL())
+        
+        @NSValue.make_trait(NSTraits.Stream)
+        class __trait__Stream:
+            @NSValue.Native
+            def stream( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Stream, ())
+                return bound
+        
+        @NSValue.make_trait(NSTraits.Iterator)
+        class __trait__Iterator:
+            @NSValue.Native
+            def items( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Stream, ())
+                return NSValue.Array(list(bound.data['iter']))
+    
+    @NSValue.make_class
+    class Map:
+        def __init__( self: NSValue ):
+            # key -> ( key value, value )
+            self.data['entries'] = {}
+        
+        @NSValue.Native
+        def get( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Map)
+            if len(args) not in (1,2):
+                raise FunctionException('Expected a key and an optional default value')
+            entry = bound.data['entries'].get(util.key(ctx, frame, args[0]))
+            return entry[1] if entry != None else args[1] if len(args) == 2 else NULL()
+        
+        @NSValue.Native
+        def set( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Map)
+            if len(args) != 2:
+                raise FunctionException('Expected a key and a value')
+            key, value = args
+            bound.data['entries'][util.key(ctx, frame, key)] = (util.own(ctx, frame, key), util.own(ctx, frame, value))
+            return NULL()
+        
+        @NSValue.Native
+        def has( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Map)
+            if len(args) != 1:
+                raise FunctionException('Expected a key')
+            return NSValue.Boolean(util.key(ctx, frame, args[0]) in bound.data['entries'])
+        
+        @NSValue.Native
+        def delete( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Map)
+            if len(args) != 1:
+                raise FunctionException('Expected a key')
+            return NSValue.Boolean(bound.data['entries'].pop(util.key(ctx, frame, args[0]), None) != None)
+        
+        @NSValue.Native
+        def size( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Map, ())
+            return NSValue.Number(len(bound.data['entries']))
+        
+        @NSValue.Native
+        def keys( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Map, ())
+            return NSValue.Array([util.own(ctx, frame, key) for key, _ in bound.data['entries'].values()])
+        
+        @NSValue.Native
+        def values( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_args(bound, args, NSTypes.Map, ())
+            return NSValue.Array([util.own(ctx, frame, value) for _, value in bound.data['entries'].values()])
+        
+        @NSValue.make_trait(NSTraits.Stream)
+        class __trait__Stream:
+            @NSValue.Native
+            def stream( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Map, ())
+                # The keys are read from a snapshot so that the loop body may update the map
+                return NSTypes.Stream.instantiate(key for key, _ in list(bound.data['entries'].values()))
+        
+        @NSValue.make_trait(NSTraits.ToString)
+        class __trait__ToString:
+            @NSValue.Native
+            def toString( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Map, ())
+                return NSValue.String('{'+', '.join(toNSString(ctx,frame,key,rep=True)+': '+toNSString(ctx,frame,value,rep=True) for key, value in bound.data['entries'].values())+'}')
                 
     @NSValue.make_class
     class Boolean:
         @NSValue.make_trait(NSTraits.Copy)
         class __trait__Copy:
-            def copy(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Boolean, ())
-                return NSValue.Boolean(args.bound.data)
+            @NSValue.Native
+            def copy( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Boolean, ())
+                return NSValue(bound.data,NSTypes.Boolean)
     
     @NSValue.make_class
     class Logic:
@@ -657,22 +1706,24 @@ class NSTypes:
             self.data['children'] = []
             self.data['variant'] = variant
         
-        def connect( ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments' ) -> NSValue:
-            _check_bound_to(args, NSTypes.Logic)
-            for i, arg in enumerate(args.args):
-                if not isinstance(arg,NSValue) or arg.type != NSTypes.Logic:
+        @NSValue.Native
+        def connect( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+            _check_bound_to(bound, NSTypes.Logic)
+            for i, arg in enumerate(args):
+                if not isinstance(arg,NSValue) or arg.type is not NSTypes.Logic:
                     raise FunctionException('Invalid argument #%d'%(i+1,))
-                args.bound.data['children'].append(arg)
-                arg.data['parents'].append(args.bound)
+                bound.data['children'].append(arg)
+                arg.data['parents'].append(bound)
             return NULL()
             
         @NSValue.make_trait(NSTraits.Op.Gt)
         class __trait__Gt:
-            def gt(ctx: 'NSEContext', frame: 'NSEFrame', args: 'NSFunction.Arguments'):
-                _check_args(args, NSTypes.Logic, (NSTypes.Logic,))
-                other, = args.args
-                args.bound.data['children'].append(other)
-                other.data['parents'].append(args.bound)
+            @NSValue.Native
+            def gt( ctx: 'NSEContext', frame: 'NSEFrame', bound: Optional[NSValue], args: list[NSValue] ) -> NSValue:
+                _check_args(bound, args, NSTypes.Logic, (NSTypes.Logic,))
+                other, = args
+                bound.data['children'].append(other)
+                other.data['parents'].append(bound)
                 return NULL()
             
     @NSValue.make_class
@@ -682,41 +1733,93 @@ class NSTypes:
     @NSValue.make_class
     class Component:
         def __init__( self: NSValue ):
-            self.props['inputs'] = NSValue.Array([])
-            self.props['outputs'] = NSValue.Array([])
+            self.set('inputs', NSValue.Array([]))
+            self.set('outputs', NSValue.Array([]))
+            
+    Float64Array = typed_array('Float64Array','d')
+    Int64Array = typed_array('Int64Array','q')
 
 NSValue._latetype()
 
-NULL = lambda: NSValue(None,NSKind.Null,None)
-TRUE = lambda: NSValue(True,NSTypes.Boolean,None)
-FALSE = lambda: NSValue(False,NSTypes.Boolean,None)
+_NULL = NSValue.constant(NSValue(None,NSKind.Null,None))
+_TRUE = NSValue.pooled(NSValue(True,NSTypes.Boolean,None))
+_FALSE = NSValue.pooled(NSValue(False,NSTypes.Boolean,None))
+
+NULL = lambda: _NULL
+TRUE = lambda: _TRUE
+FALSE = lambda: _FALSE
+
+NSValue.small_numbers = dict((float(i),NSValue.pooled(NSValue(float(i),NSTypes.Number))) for i in range(-128,1025))
 
 class NSEVars:
     
     parent : Optional['NSEVars']
     vars   : dict
     locked : bool
+    node   : Optional[ns.Node]
+    
+    fixed    : set[str] = set()
+    shadowed : set[str] = set()
+    version  : int = 0
     
     def __init__(self,v:Optional[Union['NSEVars',dict]]=None,locked:bool=False):
         self.locked = locked
+        self.node = None
         if not v:
             self.parent = None
             self.vars = {}
         elif type(v) == dict:
             self.parent = None
             self.vars = v
-        elif type(v) == NSEVars:
+            if locked:
+                NSEVars.fixed.update(v)
+                NSEVars.version += 1
+            else:
+                NSEVars.shadow(v)
+        elif isinstance(v,NSEVars):
             self.parent = v
             self.vars = {}
         else:
             raise TypeError(v)
+    
+    @staticmethod
+    def shadow(names:Iterable[str]):
+        """
+        Marks names of locked scopes bound elsewhere as no longer cacheable
+        """
+        if not NSEVars.fixed.isdisjoint(names):
+            names = NSEVars.fixed.intersection(names)
+            if not NSEVars.shadowed.issuperset(names):
+                NSEVars.shadowed.update(names)
+                NSEVars.version += 1
         
-    def extend(self,v:Optional[dict]=None) -> 'NSEVars':
+    def extend(self,v:Optional[dict]=None,node:Optional[ns.Node]=None) -> 'NSEVars':
         u = NSEVars(self)
+        # The node whose execution binds names in this scope
+        u.node = node
         if v: 
-            u.vars.update(v)
+            u.vars = v
+            NSEVars.shadow(v)
+        return u
+    
+    def detach(self,parent:Optional['NSEVars']) -> 'NSEVars':
+        """
+        Scope sharing the bindings of this one, but linked to the given parent instead of its own
+        """
+        u = NSEVars()
+        u.vars = self.vars
+        u.locked = self.locked
+        u.node = self.node
+        u.parent = parent
         return u
     
+    def scope(self,name:str) -> Optional['NSEVars']:
+        if name in self.vars:
+            return self
+        elif self.parent:
+            return self.parent.scope(name)
+        return None
+    
     def get(self,name:str) -> tuple[bool,Any]:
         if name in self.vars:
             return (True,self.vars[name])
@@ -735,8 +1838,36 @@ class NSEVars:
         return False
     
     def new(self,name:str,value:Any):
+        if self.locked:
+            NSEVars.fixed.add(name)
+            NSEVars.version += 1
+        elif name in NSEVars.fixed:
+            NSEVars.shadow((name,))
         self.vars[name] = value
         
+class NSECells(NSEVars):
+    """
+    Scope of a closure, each free variable is looked up through its own chain of the scopes that hold it or may bind it
+    """
+    
+    cells : dict[str,Optional[NSEVars]]
+    
+    def __init__(self,cells:dict[str,Optional[NSEVars]]):
+        super().__init__()
+        self.cells = cells
+        
+    def scope(self,name:str) -> Optional[NSEVars]:
+        scope = self.cells.get(name)
+        return scope.scope(name) if scope != None else None
+    
+    def get(self,name:str) -> tuple[bool,Any]:
+        scope = self.cells.get(name)
+        return scope.get(name) if scope != None else (False,None)
+    
+    def set(self,name:str,value:Any) -> bool:
+        scope = self.cells.get(name)
+        return scope.set(name,value) if scope != None else False
+        
 class NSEFrame:
     
     vars   : NSEVars
@@ -746,8 +1877,8 @@ class NSEFrame:
         self.vars = vars
         self.parent = parent
         
-    def __call__( self, vars: Optional[dict] = None ) -> 'NSEFrame':
-        return NSEFrame(self.vars.extend(vars),self)
+    def __call__( self, vars: Optional[dict] = None, node: Optional[ns.Node] = None ) -> 'NSEFrame':
+        return NSEFrame(self.vars.extend(vars,node),self)
 
 NSEExecutor = Callable[[ns.Node,NSEFrame,'NSEContext'],NSValue]
 _executors : dict[Type[ns.Node],NSEExecutor] = {}
@@ -768,6 +1899,8 @@ class NSEExecutors:
         v = NULL()
         for node in node.children:
             v = ctx.exec(node,frame)
+            if ctx.completion:
+                break
         return v
             
     @_executor(ns.NodeExpression)
@@ -778,32 +1911,55 @@ class NSEExecutors:
     
     @_executor(ns.NodeName)
     def Name( node: ns.NodeName, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
-        found, value = frame.vars.get(node.name)
-        if not found:
+        cached = getattr(node, '_nse_global', None)
+        if cached != None and cached[0] == NSEVars.version:
+            return cached[1]
+        scope = frame.vars.scope(node.name)
+        if scope == None:
             raise NSEException.fromNode('No such variable exists in this scope',node)
+        value = scope.vars[node.name]
+        if scope.locked and node.name not in NSEVars.shadowed:
+            # Names only ever bound in a locked scope resolve to the same value until the version changes
+            node._nse_global = (NSEVars.version, value)
         return value
     
     @_executor(ns.NodeLet)
     def Let( node: ns.NodeLet, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
         value = ctx.exec(node.expr,frame) if node.expr != None else NULL()
+        # Decorators assign their result into the bound value, so it can't be a pooled one
+        value = util.own(ctx, frame, value) if NSEDescriptor.of(node).decorated else util.bind(ctx, frame, value)
         frame.vars.new(node.name,value)
         return value
                 
     @_executor(ns.NodeCall)
     def Call( node: ns.NodeCall, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
-        value = ctx.exec(node.value,frame)
-        kwargs = {} # TODO: Implement keyword arguments (could probably also do something about them in the parser)
+        receiver = None
+        if type(node.value) is ns.NodeAccessColon and not NSEDescriptor.of(node.value).decorated:
+            # Method call, the receiver is passed straight to the method without creating a bound function
+            receiver, value = NSEExecutors.method(node.value, frame, ctx)
+        else:
+            value = ctx.exec(node.value,frame)
         args = [ctx.exec(arg,frame) for arg in node.args]
-        
-        if value.type == NSTypes.Function:
+        kwargs = {} # TODO: Implement keyword arguments (could probably also do something about them in the parser)
+        return NSEExecutors.call(node, value, receiver, args, kwargs, frame, ctx)
+    
+    @staticmethod
+    def call( node: ns.NodeCall, value: NSValue, receiver: Optional[NSValue], args: list[NSValue], kwargs: dict[str,NSValue], frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
+        """
+        Calls an evaluated callee, the receiver of a method call takes precedence over the bound value
+        """
+        if value.type is NSTypes.Function:
             f = value.data['__function'].get('func',None) 
             if f and isinstance(f,NSFunction):    
+                bound = receiver if receiver != None else value.data['__function'].get('bound',None)
                 try:
-                    return f.call(ctx,frame,NSFunction.Arguments(args,kwargs,value,value.data['__function'].get('bound',None)))
+                    if kwargs:
+                        return f.call(ctx,frame,NSFunction.Arguments(args,kwargs,value,bound))
+                    return f.invoke(ctx,frame,bound,args,value)
                 except FunctionException as error:
                     raise NSEException.fromNode(error.message or '',node)
                 
-        if value.type == NSTypes.Decorator:
+        if value.type is NSTypes.Decorator:
             if len(args) == 0:
                 raise NSEException.fromNode('Inline decorator calls require at least one argument', node)
             if 'post' in value.data:
@@ -822,10 +1978,22 @@ class NSEExecutors:
             found, value = frame.vars.get('self')
             if not found:
                 raise NSEException.fromNode('Self does not exist in this scope',node)
-        return value.get(node.prop)
+        cached = getattr(node, '_nse_shape', None)
+        if cached != None and value.shape is cached[0]:
+            return value.slots[cached[1]]
+        if value.type is NSTypes.Module:
+            util.resolve(value)
+        i = value.shape.slot(node.prop)
+        if i == None or value.type is NSKind.Ref:
+            return value.get(node.prop)
+        node._nse_shape = (value.shape, i)
+        return value.slots[i]
 
-    @_executor(ns.NodeAccessColon)
-    def AccessColon( node: ns.NodeAccessColon, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
+    @staticmethod
+    def method( node: ns.NodeAccessColon, frame: NSEFrame, ctx: 'NSEContext' ) -> tuple[NSValue,NSValue]:
+        """
+        Resolves the receiver and the unbound property of a method access
+        """
         value = None
         if node.node:
             value = ctx.exec(node.node, frame)
@@ -833,10 +2001,19 @@ class NSEExecutors:
             found, value = frame.vars.get('self')
             if not found:
                 raise NSEException.fromNode('Self does not exist in this scope',node)
-             
-        val = value.get(node.prop,False,True) if value.type != NSTypes.Module else value.get(node.prop)
-        if val.type == NSTypes.Function:
-            val = NSValue({'__function':{'func':val.data['__function'].get('func',None),'bound':value}},val.type,val.props)
+        return value, NSEExecutors.member(node, value)
+    
+    @staticmethod
+    def member( node: ns.NodeAccessColon, value: NSValue ) -> NSValue:
+        if value.type is NSTypes.Module:
+            return util.resolve(value).get(node.prop)
+        return NSEInlineCache.of(node).get_member(value, node.prop)
+
+    @_executor(ns.NodeAccessColon)
+    def AccessColon( node: ns.NodeAccessColon, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
+        value, val = NSEExecutors.method(node, frame, ctx)
+        if val.type is NSTypes.Function:
+            return NSValue({'__function':{'func':val.data['__function'].get('func',None),'bound':value}},val.type,val.props)
         return val
     
     @_executor(ns.NodeAccessColonDouble)
@@ -848,10 +2025,102 @@ class NSEExecutors:
             found, value = frame.vars.get('self')
             if not found:
                 raise NSEException.fromNode('Self does not exist in this scope',node)
-        val = value.get(node.prop,False,True) if value.type != NSTypes.Module else value.get(node.prop)
+        val = value.get(node.prop,False,True) if value.type is not NSTypes.Module else util.resolve(value).get(node.prop)
         return val
 
                 
+    binary_traits = {
+        '>' : ( NSTraits.Op.Gt, 'gt' ),
+        '<' : ( NSTraits.Op.Lt, 'lt' ),
+        '+' : ( NSTraits.Op.Add, 'add' ),
+        '-' : ( NSTraits.Op.Sub, 'sub' ),
+        '*' : ( NSTraits.Op.Mul, 'mul' ),
+        '/' : ( NSTraits.Op.Div, 'div' ),
+        '%' : ( NSTraits.Op.Mod, 'mod' ),
+        '&' : ( NSTraits.Op.BitAnd, 'bitAnd' ),
+        '|' : ( NSTraits.Op.BitOr, 'bitOr' ),
+        '^' : ( NSTraits.Op.BitXor, 'bitXor' ),
+        '<<' : ( NSTraits.Op.Shl, 'shl' ),
+        '>>' : ( NSTraits.Op.Shr, 'shr' ),
+    }
+    
+    # logical operator -> ( truthiness of the left side that skips the right one, assigns the right side )
+    logical = {
+        '&&'  : ( False, False ),
+        '||'  : ( True, False ),
+        '&&=' : ( False, True ),
+        '||=' : ( True, True ),
+    }
+    
+    # compound assignment -> ( binary operator, in place trait, method name )
+    compound_traits = {
+        '+='  : ( '+', NSTraits.Op.AddAssign, 'addAssign' ),
+        '-='  : ( '-', NSTraits.Op.SubAssign, 'subAssign' ),
+        '*='  : ( '*', NSTraits.Op.MulAssign, 'mulAssign' ),
+        '/='  : ( '/', NSTraits.Op.DivAssign, 'divAssign' ),
+        '%='  : ( '%', None, None ),
+        '^='  : ( '^', None, None ),
+        '&='  : ( '&', None, None ),
+        '|='  : ( '|', None, None ),
+        '>>=' : ( '>>', None, None ),
+        '<<=' : ( '<<', None, None ),
+    }
+    
+    unary_traits = {
+        '++' : ( NSTraits.Op.Inc, 'inc' ),
+        '--' : ( NSTraits.Op.Dec, 'dec' ),
+    }
+    
+    # Operations between built-in types that are computed directly instead of going through their traits
+    # left type -> operator -> ( right type, operation, result constructor )
+    native_binary = {
+        NSTypes.Number: {
+            '>'  : ( NSTypes.Number, operator.gt, NSValue.Boolean ),
+            '<'  : ( NSTypes.Number, operator.lt, NSValue.Boolean ),
+            '==' : ( NSTypes.Number, operator.eq, NSValue.Boolean ),
+            '+'  : ( NSTypes.Number, operator.add, NSValue.Number ),
+            '-'  : ( NSTypes.Number, operator.sub, NSValue.Number ),
+            '*'  : ( NSTypes.Number, operator.mul, NSValue.Number ),
+            '/'  : ( NSTypes.Number, operator.truediv, NSValue.Number ),
+            '!=' : ( NSTypes.Number, operator.ne, NSValue.Boolean ),
+            '>=' : ( NSTypes.Number, operator.ge, NSValue.Boolean ),
+            '<=' : ( NSTypes.Number, operator.le, NSValue.Boolean ),
+            '%'  : ( NSTypes.Number, lambda a, b: util.modulo(a, b), NSValue.Number ),
+            '&'  : ( NSTypes.Number, lambda a, b: util.integer(a) & util.integer(b), NSValue.Number ),
+            '|'  : ( NSTypes.Number, lambda a, b: util.integer(a) | util.integer(b), NSValue.Number ),
+            '^'  : ( NSTypes.Number, lambda a, b: util.integer(a) ^ util.integer(b), NSValue.Number ),
+            '<<' : ( NSTypes.Number, lambda a, b: util.integer(a) << util.shift(b, 64), NSValue.Number ),
+            '>>' : ( NSTypes.Number, lambda a, b: util.integer(a) >> util.shift(b), NSValue.Number ),
+        },
+        NSTypes.String: {
+            '>'  : ( NSTypes.String, lambda a, b: str(a) > str(b), NSValue.Boolean ),
+            '<'  : ( NSTypes.String, lambda a, b: str(a) < str(b), NSValue.Boolean ),
+            '==' : ( NSTypes.String, lambda a, b: str(a) == str(b), NSValue.Boolean ),
+            '!=' : ( NSTypes.String, lambda a, b: str(a) != str(b), NSValue.Boolean ),
+            '>=' : ( NSTypes.String, lambda a, b: str(a) >= str(b), NSValue.Boolean ),
+            '<=' : ( NSTypes.String, lambda a, b: str(a) <= str(b), NSValue.Boolean ),
+            '+'  : ( NSTypes.String, NSRope.concat, NSValue.String ),
+        },
+        NSTypes.Boolean: {
+            '==' : ( NSTypes.Boolean, operator.eq, NSValue.Boolean ),
+            '!=' : ( NSTypes.Boolean, operator.ne, NSValue.Boolean ),
+            '&'  : ( NSTypes.Boolean, operator.and_, NSValue.Boolean ),
+            '|'  : ( NSTypes.Boolean, operator.or_, NSValue.Boolean ),
+            '^'  : ( NSTypes.Boolean, operator.xor, NSValue.Boolean ),
+        },
+    }
+    
+    # value type -> operator -> ( operation, result constructor )
+    native_unary = {
+        NSTypes.Number: {
+            '++' : ( lambda v: v+1, NSValue.Number ),
+            '--' : ( lambda v: v-1, NSValue.Number ),
+        },
+        NSTypes.String: {
+            '--' : ( lambda v: str(v)[:-1], NSValue.String ),
+        },
+    }
+                
     @_executor(ns.NodeOperatorBinary)
     def OperatorBinary( node: ns.NodeOperatorBinary, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
         op = node.op.t
@@ -861,73 +2130,133 @@ class NSEExecutors:
             right = ctx.exec(node.right, frame)
             assign(node.left, right, frame, ctx)
             return right
+        
+        left: NSValue = ctx.exec(node.left, frame)
+        
+        logical = NSEExecutors.logical.get(op)
+        if logical:
             
-        elif op == '==':
+            if NSEExecutors.truthy(left) is logical[0]:
+                return left
+            right = ctx.exec(node.right, frame)
+            if logical[1]:
+                assign(node.left, right, frame, ctx)
+            return right
+        
+        right: NSValue = ctx.exec(node.right, frame)
+        return NSEExecutors.binary(node, left, right, frame, ctx)
+    
+    @staticmethod
+    def binary( node: ns.NodeOperatorBinary, left: NSValue, right: NSValue, frame: NSEFrame, ctx: 'NSEContext', op: Optional[str] = None ) -> NSValue:
+        """
+        Applies a binary operator other than `=` to its evaluated operands
+        """
+        if op == None:
+            op = node.op.t
+            compound = NSEExecutors.compound_traits.get(op)
+            if compound:
+                return NSEExecutors.compound(node, compound, left, right, frame, ctx)
+        
+        native = NSEExecutors.native_binary.get(left.type)
+        if native:
+            native = native.get(op)
+            if native and right.type is native[0]:
+                try:
+                    return native[2](native[1](left.data, right.data))
+                except FunctionException as error:
+                    raise NSEException.fromNode(error.message or '',node)
             
-            left: NSValue = ctx.exec(node.left, frame)
-            right: NSValue = ctx.exec(node.right, frame)
+        if op == '==' or op == '!=':
             
             if left.type in (NSKind.Class, NSKind.Trait, NSKind.Null, NSKind.Ref):
-                return NSValue.Boolean(left == right)
+                return NSValue.Boolean((left == right) is (op == '=='))
             
-            equals = left.get_trait_method(NSTraits.Op.Eq, 'eq')
+            equals = NSEInlineCache.of(node).get_trait_method(left, NSTraits.Op.Eq, 'eq')
             
             if not equals:
-                return NSValue.Boolean(left == right)
+                return NSValue.Boolean((left == right) is (op == '=='))
             
-            result = equals.call(ctx, frame, NSFunction.Arguments([right],{},equals,left))
+            try:
+                result = equals.invoke(ctx, frame, left, [right])
+            except FunctionException as error:
+                raise NSEException.fromNode(error.message or '',node)
             
-            if result.type != NSTypes.Boolean:
+            if result.type is not NSTypes.Boolean:
                 raise NSEException.fromNode('Non-boolean return value from trait Op.Eq', node)
             
-            return result
+            return result if op == '==' else NSValue.Boolean(not result.data)
         
-        else:
+        elif op == '<=' or op == '>=':
             
-            left = ctx.exec(node.left, frame)
-            right = ctx.exec(node.right, frame)
+            # Ordered through the opposite strict comparison
+            result = NSEExecutors.binary(node, left, right, frame, ctx, '>' if op == '<=' else '<')
+            
+            if result.type is not NSTypes.Boolean:
+                raise NSEException.fromNode('Non-boolean return value from a comparison trait', node)
             
-            op_data = {
-                '>' : ( NSTraits.Op.Gt, 'gt' ),
-                '<' : ( NSTraits.Op.Lt, 'lt' ),
-                '+' : ( NSTraits.Op.Add, 'add' ),
-                '-' : ( NSTraits.Op.Sub, 'sub' ),
-                '*' : ( NSTraits.Op.Mul, 'mul' ),
-                '/' : ( NSTraits.Op.Div, 'div' ),
-            }.get(op,None)
+            return NSValue.Boolean(not result.data)
+        
+        else:
+            
+            op_data = NSEExecutors.binary_traits.get(op,None)
             
             if not op_data:
                 raise NSEException.fromToken('Unimplemented operation \'%s\''%(op),node.op)
             
             if left.type:
-                method = left.get_trait_method(op_data[0], op_data[1])
+                method = NSEInlineCache.of(node).get_trait_method(left, op_data[0], op_data[1])
                 if method:
                     try:
-                        return method.call(ctx, frame,  NSFunction.Arguments([right],{},method,left))
+                        return method.invoke(ctx, frame, left, [right])
                     except FunctionException as error:
                         raise NSEException.fromNode(error.message or '',node)
                 raise NSEException.fromToken('Unsupported operation \'%s\' between `%s` and `%s`'%(op,toNSString(ctx,frame,left.type),toNSString(ctx,frame,right.type)),node.op)
             
             return NULL()
         
+    @staticmethod
+    def compound( node: ns.NodeOperatorBinary, compound: tuple, left: NSValue, right: NSValue, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
+        """
+        Applies a compound assignment, containers implementing its trait are updated in place
+        """
+        op, trait, name = compound
+        target = node.left
+        while isinstance(target, ns.NodeExpression):
+            target = target.expression
+        # Only values held by a variable, a property or a reference can be updated in place
+        if trait != None and (isinstance(target, (ns.NodeName, ns.NodeAccessDot)) or (isinstance(target, ns.NodeOperatorPrefix) and target.op.t == '*')):
+            method = NSEInlineCache.compound(node).get_trait_method(left, trait, name)
+            if method:
+                try:
+                    return method.invoke(ctx, frame, left, [right])
+                except FunctionException as error:
+                    raise NSEException.fromNode(error.message or '',node)
+        value = NSEExecutors.binary(node, left, right, frame, ctx, op)
+        assign(node.left, value, frame, ctx)
+        return value
+        
     @_executor(ns.NodeOperatorPostfix)
     def OperatorPostfix( node: ns.NodeOperatorPostfix, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
         op = node.op.t
         
         value = ctx.exec(node.value, frame)
         
-        op_data = {
-            '++' : ( NSTraits.Op.Inc, 'inc' ),
-            '--' : ( NSTraits.Op.Dec, 'dec' ),
-        }.get(op,None)
+        native = NSEExecutors.native_unary.get(value.type)
+        if native:
+            native = native.get(op)
+            if native:
+                assign(node.value, native[1](native[0](value.data)), frame, ctx)
+                return value
+        
+        op_data = NSEExecutors.unary_traits.get(op,None)
         
         if not op_data:
             raise NSEException.fromToken('Unimplemented operation \'%s\''%(op),node.op)
 
-        method = value.get_trait_method(op_data[0], op_data[1])
+        method = NSEInlineCache.of(node).get_trait_method(value, op_data[0], op_data[1])
         if method:
             try:
-                result = method.call(ctx, frame,  NSFunction.Arguments([],{},method,value))
+                result = method.invoke(ctx, frame, value, [])
                 assign(node.value, result, frame, ctx)
                 return value
             except FunctionException as error:
@@ -940,142 +2269,216 @@ class NSEExecutors:
         
         if op == '&':
 
-            return NSValue(ctx.exec(node.value, frame, False), NSKind.Ref)
+            return reference(node.value, frame, ctx)
         
         elif op == '*':
             
             value = ctx.exec(node.value, frame)
             
-            if value.type == NSKind.Ref:
+            if value.type is NSKind.Ref:
                 return value.data
             
             raise NSEException.fromToken('Can\'t dereference `%s`'%(toNSString(ctx,frame,value.type),),node.op)
+        
+        elif op == '!':
+            
+            return NSValue.Boolean(not NSEExecutors.truthy(ctx.exec(node.value, frame)))
+        
+        elif op == '~':
+            
+            value = ctx.exec(node.value, frame)
+            
+            try:
+                if value.type is NSTypes.Number:
+                    return NSValue.Number(~util.integer(value.data))
+                method = NSEInlineCache.of(node).get_trait_method(value, NSTraits.Op.BitNot, 'bitNot')
+                if method:
+                    return method.invoke(ctx, frame, value, [])
+            except FunctionException as error:
+                raise NSEException.fromNode(error.message or '',node)
+            raise NSEException.fromToken('Unsupported operation \'%s\' for `%s`'%(op,toNSString(ctx,frame,value.type)),node.op)
             
         else:
             
             value = ctx.exec(node.value, frame)
             
-            op_data = {
-                '++' : ( NSTraits.Op.Inc, 'inc' ),
-                '--' : ( NSTraits.Op.Dec, 'dec' ),
-            }.get(op,None)
+            native = NSEExecutors.native_unary.get(value.type)
+            if native:
+                native = native.get(op)
+                if native:
+                    result = native[1](native[0](value.data))
+                    assign(node.value, result, frame, ctx)
+                    return result
+            
+            op_data = NSEExecutors.unary_traits.get(op,None)
             
             if not op_data:
                 raise NSEException.fromToken('Unimplemented operation \'%s\''%(op),node.op)
 
-            method = value.get_trait_method(op_data[0], op_data[1])
+            method = NSEInlineCache.of(node).get_trait_method(value, op_data[0], op_data[1])
             if method:
                 try:
-                    result = method.call(ctx, frame,  NSFunction.Arguments([],{},method,value))
+                    result = method.invoke(ctx, frame, value, [])
                     assign(node.value, result, frame, ctx)
                     return result
                 except FunctionException as error:
                     raise NSEException.fromNode(error.message or '',node)
             raise NSEException.fromToken('Unsupported operation \'%s\' for `%s`'%(op,toNSString(ctx,frame,value.type)),node.op)
         
+    @_executor(ns.NodeIndex)
+    def Index( node: ns.NodeIndex, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
+        value = ctx.exec(node.value, frame)
+        try:
+            if node.sep == ':':
+                return util.slice(ctx, frame, value, [ctx.exec(bound, frame) for bound in node.index])
+            if node.sep != None or len(node.index) != 1:
+                raise NSEException.fromNode('Expected a single index',node)
+            key = ctx.exec(node.index[0], frame)
+            if value.type is NSTypes.Array and key.type is NSTypes.Number:
+                items = value.data['items']
+                # Checking the range first keeps infinities and NaN away from int()
+                if 0 <= key.data < len(items) and int(key.data) == key.data:
+                    return items[int(key.data)]
+            return util.index(ctx, frame, value, key)
+        except FunctionException as error:
+            raise NSEException.fromNode(error.message or '',node)
+    
     @_executor(ns.NodeIf)
     def If( node: ns.NodeIf, frame: NSEFrame, ctx: 'NSEContext' ):
         value = ctx.exec(node.condition, frame)
         
-        # TODO: Add truthiness trait?
-        if value.type == NSKind.Null:
-            res = False
-        elif value.type == NSKind.Ref:
-            res = value.data.type != NSKind.Null
-        elif value.type == NSTypes.String:
-            res = len(value.data) > 0
-        elif value.type == NSTypes.Number:
-            res = value.data != 0
-        elif value.type == NSTypes.Boolean:
-            res = value.data
-        else:
-            res = True
-        
-        node = node.expression if res else \
+        node = node.expression if NSEExecutors.truthy(value) else \
                node.otherwise
         
         return ctx.exec(node,frame) if node else NULL()
+    
+    @staticmethod
+    def truthy( value: NSValue ) -> bool:
+        # TODO: Add truthiness trait?
+        if value.type is NSKind.Null:
+            return False
+        elif value.type is NSKind.Ref:
+            return value.data.type is not NSKind.Null
+        elif value.type is NSTypes.String:
+            return len(value.data) > 0
+        elif value.type is NSTypes.Number:
+            return value.data != 0
+        elif value.type is NSTypes.Boolean:
+            return value.data
+        return True
 
     @_executor(ns.NodeString)
     def String( node: ns.NodeString, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
-        return NSValue.String(node.value)
+        try:
+            return node._nse_constant
+        except AttributeError:
+            value = node._nse_constant = NSValue.pooled(NSValue.String(node.value))
+            return value
 
     @_executor(ns.NodeNumber)
     def Number( node: ns.NodeNumber, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
-        return NSValue.Number(node.value)
+        try:
+            return node._nse_constant
+        except AttributeError:
+            value = node._nse_constant = NSValue.pooled(NSValue.Number(node.value))
+            return value
 
     @_executor(ns.NodeFunction)
     def Function( node: ns.NodeFunction, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
         func = NSFunctionCode(node,frame)
         value = NSValue({'__function':{'func':func,'bound':None}},NSTypes.Function)
         if node.name:
+            value.owned = True
             frame.vars.new(node.name,value)
         return value
 
     @_executor(ns.NodeArray)
     def Array( node: ns.NodeArray, frame: NSEFrame, ctx: 'NSEContext' ) -> NSValue:
-        return NSValue.Array([ctx.exec(item,frame) for item in node.items])
+        return NSValue.Array([util.own(ctx, frame, ctx.exec(item,frame)) for item in node.items])
 
     @_executor(ns.NodeReturn)
     def Return( node: ns.NodeReturn, frame: NSEFrame, ctx: 'NSEContext' ):
-        raise RewindReturn(ctx.exec(node.value,frame) if node.value else NULL())
+        value = ctx.exec(node.value,frame) if node.value else NULL()
+        if NSECompletion.structured(node, (ns.NodeBlock,ns.NodeIf,ns.NodeFor,ns.NodeWhile), ns.NodeFunction):
+            ctx.completion = NSECompletion.Return
+            return value
+        raise RewindReturn(value)
+    
+    @_executor(ns.NodeYield)
+    def Yield( node: ns.NodeYield, frame: NSEFrame, ctx: 'NSEContext' ):
+        raise NSEException.fromNode('Cannot yield outside of a generator function body',node)
     
     @_executor(ns.NodeBreak)
     def Break( node: ns.NodeBreak, frame: NSEFrame, ctx: 'NSEContext' ):
-        raise RewindBreak(ctx.exec(node.value,frame) if node.value else NULL())
+        value = ctx.exec(node.value,frame) if node.value else NULL()
+        if NSECompletion.structured(node, (ns.NodeBlock,ns.NodeIf), (ns.NodeFor,ns.NodeWhile)):
+            ctx.completion = NSECompletion.Break
+            return value
+        raise RewindBreak(value)
     
     @_executor(ns.NodeContinue)
     def Continue( node: ns.NodeContinue, frame: NSEFrame, ctx: 'NSEContext' ):
-        raise RewindContinue(ctx.exec(node.value,frame) if node.value else NULL())
+        value = ctx.exec(node.value,frame) if node.value else NULL()
+        if NSECompletion.structured(node, (ns.NodeBlock,ns.NodeIf), (ns.NodeFor,ns.NodeWhile)):
+            ctx.completion = NSECompletion.Continue
+            return value
+        raise RewindContinue(value)
                 
     @_executor(ns.NodeFor)
     def For( node: ns.NodeFor, frame: NSEFrame, ctx: 'NSEContext' ):
-        iterable = ctx.exec(node.iterable, frame)
-        items = []
-        if iterable.type == NSTypes.Array:
-            items = iterable
-        else:
-            itemsFn = iterable.get_trait_method(NSTraits.Iterator,'items')
-            if not itemsFn:
-                raise NSEException.fromNode('Value is not iterable',node.iterable)
-            items = itemsFn.call(ctx,frame,NSFunction.Arguments([],{},itemsFn,iterable))
+        items = NSEExecutors.items(node, ctx.exec(node.iterable, frame), frame, ctx)
         out = NULL()
-        for i, item in enumerate(items.data['items']):
+        for i, item in enumerate(items):
             v = {
                 node.name_it.t: item
             }
             if node.name_i != None:
-                v[node.name_i.t] = NSValue.Number(i)
+                v[node.name_i.t] = util.bind(ctx, frame, NSValue.Number(i))
             try:
-                out = ctx.exec(node.body,frame(v))
+                out = ctx.exec(node.body,frame(v,node))
             except RewindBreak as brk:
                 return brk.value
             except RewindContinue as cnt:
                 out = cnt.value
+            if ctx.completion and NSECompletion.loop(ctx):
+                return out
         return out
             
+    @staticmethod
+    def items( node: ns.NodeFor, iterable: NSValue, frame: NSEFrame, ctx: 'NSEContext' ) -> Iterable[NSValue]:
+        """
+        Returns the items a for loop iterates over, streams are pulled one item at a time
+        """
+        if iterable.type is NSTypes.Array:
+            return iterable.data['items']
+        streamFn = iterable.get_trait_method(NSTraits.Stream,'stream')
+        if streamFn:
+            stream = streamFn.invoke(ctx,frame,iterable,[])
+            if stream.type is not NSTypes.Stream:
+                raise NSEException.fromNode('Expected stream to return a Stream',node.iterable)
+            return NSEExecutors.pull(node, stream.data['iter'], frame, ctx)
+        itemsFn = iterable.get_trait_method(NSTraits.Iterator,'items')
+        if not itemsFn:
+            raise NSEException.fromNode('Value is not iterable',node.iterable)
+        return itemsFn.invoke(ctx,frame,iterable,[]).data['items']
+            
+    @staticmethod
+    def pull( node: ns.NodeFor, stream: Iterator[NSValue], frame: NSEFrame, ctx: 'NSEContext' ) -> Generator[NSValue,None,None]:
+        """
+        Pulls the items of a stream, reporting native errors at the iterated expression
+        """
+        try:
+            for item in stream:
+                yield util.own(ctx, frame, item)
+        except FunctionException as error:
+            raise NSEException.fromNode(error.message or '',node.iterable)
+            
     @_executor(ns.NodeWhile)
     def While( node: ns.NodeWhile, frame: NSEFrame, ctx: 'NSEContext' ):
         v = NULL()
         
         while True:
-            value = ctx.exec(node.condition, frame)
-            
-            # TODO: Add truthiness trait?
-            if value.type == NSKind.Null:
-                res = False
-            elif value.type == NSKind.Ref:
-                res = value.data.type != NSKind.Null
-            elif value.type == NSTypes.String:
-                res = len(value.data) > 0
-            elif value.type == NSTypes.Number:
-                res = value.data != 0
-            elif value.type == NSTypes.Boolean:
-                res = value.data
-            else:
-                res = True
-                
-            if not res:
+            if not NSEExecutors.truthy(ctx.exec(node.condition, frame)):
                 break
             
             if node.body:
@@ -1085,33 +2488,28 @@ class NSEExecutors:
                     return brk.value
                 except RewindContinue as cnt:
                     v = cnt.value
+                if ctx.completion and NSECompletion.loop(ctx):
+                    return v
             
         return v
 
     @_executor(ns.NodeRefExpression)
     def RefExpression( node: ns.NodeRefExpression, frame: NSEFrame, ctx: 'NSEContext' ):
-        value = ctx.exec(node.value,frame,not node.ref)
         name = node.name.t if node.name != None else 'it'
         if node.ref:
-            value = NSValue(value, NSKind.Ref)
-        out = ctx.exec(node.expression,frame({name:value,'self':value}))
+            value = reference(node.value, frame, ctx)
+        else:
+            value = util.own(ctx, frame, ctx.exec(node.value,frame))
+        out = ctx.exec(node.expression,frame({name:value,'self':value},node))
         return out if node.takeResult else value
     
     @_executor(ns.NodeImport)
     def NodeImport( node: ns.NodeImport, frame: NSEFrame, ctx: 'NSEContext' ):
         for name in node.names:
-            paths = [
-                pathHere.joinpath(name+'.ns').resolve()
-            ]
-            for p in paths:
-                if p.exists():
-                    # TODO: Maybe cache the imports?
-                    source = ns.Source.fromFile(p)
-                    tokens = ns.tokenize(source)
-                    tree = ns.parse(tokens)
-                    result = exec_code(tree)
-                    frame.vars.new(name,NSValue(None,NSTypes.Module,result.frame.vars.vars))
-                    break
+            p = find_module(name)
+            if p != None:
+                # The module only runs once one of its members gets accessed
+                frame.vars.new(name,NSValue.constant(NSValue({'path':p},NSTypes.Module)))
         return NULL()
                     
 NSEExecutors.executors = _executors
@@ -1124,9 +2522,9 @@ def apply_decorators_pre(ctx: 'NSEContext', frame: NSEFrame, node: ns.Decoratabl
             raise NSEException.fromNode('No such variable exists in this scope',dec)
         for arg in dec.args:
             args.append(ctx.exec(arg.expression,frame))
-        if decorator.type == NSTypes.Function:
+        if decorator.type is NSTypes.Function:
             pass
-        elif decorator.type == NSTypes.Decorator:
+        elif decorator.type is NSTypes.Decorator:
             # TODO: Add support for NS functions
             if 'pre' in decorator.data:
                 f = decorator.data['pre']
@@ -1142,14 +2540,14 @@ def apply_decorators_post(ctx: 'NSEContext', frame: NSEFrame, node: ns.Decoratab
         args = []
         for arg in dec.args:
             args.append(ctx.exec(arg.expression,frame))
-        if decorator.type == NSTypes.Function:
+        if decorator.type is NSTypes.Function:
             f = decorator.data['__function'].get('func',None)
             # if not f or not isinstance(f,NSFunction):
             #     raise NSEException.fromNode('Value is not callable',node)
             v = util.copy(ctx, frame, value)
-            r = f.call(ctx,frame,NSFunction.Arguments([v,NSValue.Array(args)],{},decorator,decorator.data['__function'].get('bound',None)))     
+            r = f.invoke(ctx,frame,decorator.data['__function'].get('bound',None),[v,NSValue.Array(args)],decorator)
             util.assign_ref(value,r)
-        elif decorator.type == NSTypes.Decorator:
+        elif decorator.type is NSTypes.Decorator:
             # TODO: Add support for NS functions
             if 'post' in decorator.data:
                 f = decorator.data['post']
@@ -1157,68 +2555,459 @@ def apply_decorators_post(ctx: 'NSEContext', frame: NSEFrame, node: ns.Decoratab
         else:
             raise NSEException.fromNode('Value is not a decorator',node)
 
-class NSEContext:    
+class NSETail:
+    """
+    Call in tail position, handed to the innermost pending call of the explicit stack
+    """
     
-    root_frame : NSEFrame
-    # TODO: Add trace
+    node     : ns.NodeCall
+    value    : NSValue
+    receiver : Optional[NSValue]
+    args     : list[NSValue]
+    frame    : NSEFrame
+    
+    __slots__ = ('node','value','receiver','args','frame')
+    
+    def __init__( self, node: ns.NodeCall, value: NSValue, receiver: Optional[NSValue], args: list[NSValue], frame: NSEFrame ):
+        self.node = node
+        self.value = value
+        self.receiver = receiver
+        self.args = args
+        self.frame = frame
+
+class NSEYield:
+    """
+    Value handed out of a generator function body, suspending it until the next pull
+    """
+    
+    node  : ns.NodeYield
+    value : NSValue
+    
+    __slots__ = ('node','value')
+    
+    def __init__( self, node: ns.NodeYield, value: NSValue ):
+        self.node = node
+        self.value = value
+
+NSEStepper = Callable[[ns.Node,NSEFrame,'NSEContext'],Generator[Union[tuple,NSETail,NSEYield],Any,NSValue]]
+_steppers : dict[Type[ns.Node],NSEStepper] = {}
+
+class NSESteppers:
+    """
+    Executors for the explicit stack mode, they yield `(node, frame)` to have a child evaluated
+    and receive its value back, `(node, frame, True)` marks the body of a call
+    """
+    
+    steppers : dict[Type[ns.Node],NSEStepper] = {}
+    
+    S = TypeVar('S',bound=NSEStepper)
+    def _stepper( t: Type[ns.Node] ) -> Callable[[S],S]:
+        def __stepper( fun ):
+            _steppers[t] = fun
+            return fun
+        return __stepper
+    
+    @staticmethod
+    def root( node: ns.Node, frame: NSEFrame ):
+        return (yield (node, frame))
+    
+    @_stepper(ns.NodeBlock)
+    def Block( node: ns.NodeBlock, frame: NSEFrame, ctx: 'NSEContext' ):
+        v = NULL()
+        for node in node.children:
+            v = yield (node, frame)
+            if ctx.completion:
+                break
+        return v
+    
+    @_stepper(ns.NodeExpression)
+    def Expression( node: ns.NodeExpression, frame: NSEFrame, ctx: 'NSEContext' ):
+        if node.expression == None:
+            return NULL()
+        return (yield (node.expression, frame))
+    
+    @_stepper(ns.NodeLet)
+    def Let( node: ns.NodeLet, frame: NSEFrame, ctx: 'NSEContext' ):
+        value = util.bind(ctx, frame, (yield (node.expr, frame)) if node.expr != None else NULL())
+        frame.vars.new(node.name,value)
+        return value
+    
+    @staticmethod
+    def operands( node: ns.NodeCall, frame: NSEFrame, ctx: 'NSEContext' ):
+        receiver = None
+        if type(node.value) is ns.NodeAccessColon and not NSEDescriptor.of(node.value).decorated:
+            if node.value.node:
+                receiver = yield (node.value.node, frame)
+            else:
+                found, receiver = frame.vars.get('self')
+                if not found:
+                    raise NSEException.fromNode('Self does not exist in this scope',node.value)
+            value = NSEExecutors.member(node.value, receiver)
+        else:
+            value = yield (node.value, frame)
+        args = []
+        for arg in node.args:
+            args.append((yield (arg, frame)))
+        return value, receiver, args
+    
+    @staticmethod
+    def apply( node: ns.NodeCall, value: NSValue, receiver: Optional[NSValue], args: list[NSValue], frame: NSEFrame, ctx: 'NSEContext' ):
+        while True:
+            f = value.data['__function'].get('func',None) if value.type is NSTypes.Function else None
+            if not isinstance(f,NSFunctionCode) or f.layout.generator:
+                return NSEExecutors.call(node, value, receiver, args, {}, frame, ctx)
+            try:
+                body = f.enter(ctx, frame, receiver if receiver != None else value.data['__function'].get('bound',None), args)
+            except FunctionException as error:
+                raise NSEException.fromNode(error.message or '',node)
+            if f.func.body == None:
+                return NULL()
+            try:
+                result = yield (f.func.body, body, True)
+            except RewindReturn as ret:
+                result = ret.value
+            ctx.completion = NSECompletion.Normal
+            if type(result) is not NSETail:
+                return result
+            # The call in tail position replaces this one instead of nesting inside it
+            node, value, receiver, args, frame = result.node, result.value, result.receiver, result.args, result.frame
+    
+    @_stepper(ns.NodeCall)
+    def Call( node: ns.NodeCall, frame: NSEFrame, ctx: 'NSEContext' ):
+        value, receiver, args = yield from NSESteppers.operands(node, frame, ctx)
+        return (yield from NSESteppers.apply(node, value, receiver, args, frame, ctx))
+    
+    @_stepper(ns.NodeOperatorBinary)
+    def OperatorBinary( node: ns.NodeOperatorBinary, frame: NSEFrame, ctx: 'NSEContext' ):
+        if node.op.t == '=':
+            right = yield (node.right, frame)
+            assign(node.left, right, frame, ctx)
+            return right
+        left = yield (node.left, frame)
+        logical = NSEExecutors.logical.get(node.op.t)
+        if logical:
+            if NSEExecutors.truthy(left) is logical[0]:
+                return left
+            right = yield (node.right, frame)
+            if logical[1]:
+                assign(node.left, right, frame, ctx)
+            return right
+        right = yield (node.right, frame)
+        return NSEExecutors.binary(node, left, right, frame, ctx)
+    
+    @_stepper(ns.NodeIf)
+    def If( node: ns.NodeIf, frame: NSEFrame, ctx: 'NSEContext' ):
+        value = yield (node.condition, frame)
+        node = node.expression if NSEExecutors.truthy(value) else \
+               node.otherwise
+        return (yield (node, frame)) if node else NULL()
+    
+    @_stepper(ns.NodeArray)
+    def Array( node: ns.NodeArray, frame: NSEFrame, ctx: 'NSEContext' ):
+        items = []
+        for item in node.items:
+            items.append(util.own(ctx, frame, (yield (item, frame))))
+        return NSValue.Array(items)
+    
+    @staticmethod
+    def tail( node: ns.NodeReturn ) -> Optional[ns.NodeCall]:
+        value = node.value
+        while type(value) is ns.NodeExpression and not NSEDescriptor.of(value).decorated:
+            value = value.expression
+        return value if type(value) is ns.NodeCall and not NSEDescriptor.of(value).decorated else None
+    
+    @_stepper(ns.NodeReturn)
+    def Return( node: ns.NodeReturn, frame: NSEFrame, ctx: 'NSEContext' ):
+        structured = NSECompletion.structured(node, (ns.NodeBlock,ns.NodeIf,ns.NodeFor,ns.NodeWhile), ns.NodeFunction)
+        call = NSESteppers.tail(node) if structured else None
+        if call:
+            value, receiver, args = yield from NSESteppers.operands(call, frame, ctx)
+            tail = NSETail(call, value, receiver, args, frame)
+            result = yield tail
+            if result is tail:
+                # No pending call on this stack could take the tail call over
+                result = NSEExecutors.call(call, value, receiver, args, {}, frame, ctx)
+        else:
+            result = (yield (node.value, frame)) if node.value else NULL()
+        if structured:
+            ctx.completion = NSECompletion.Return
+            return result
+        raise RewindReturn(result)
+    
+    @_stepper(ns.NodeYield)
+    def Yield( node: ns.NodeYield, frame: NSEFrame, ctx: 'NSEContext' ):
+        value = util.own(ctx, frame, (yield (node.value, frame)) if node.value else NULL())
+        yield NSEYield(node, value)
+        return NULL()
+    
+    @_stepper(ns.NodeFor)
+    def For( node: ns.NodeFor, frame: NSEFrame, ctx: 'NSEContext' ):
+        items = NSEExecutors.items(node, (yield (node.iterable, frame)), frame, ctx)
+        out = NULL()
+        for i, item in enumerate(items):
+            v = {
+                node.name_it.t: item
+            }
+            if node.name_i != None:
+                v[node.name_i.t] = util.bind(ctx, frame, NSValue.Number(i))
+            try:
+                out = yield (node.body, frame(v,node))
+            except RewindBreak as brk:
+                return brk.value
+            except RewindContinue as cnt:
+                out = cnt.value
+            if ctx.completion and NSECompletion.loop(ctx):
+                return out
+        return out
+    
+    @_stepper(ns.NodeWhile)
+    def While( node: ns.NodeWhile, frame: NSEFrame, ctx: 'NSEContext' ):
+        v = NULL()
+        while NSEExecutors.truthy((yield (node.condition, frame))):
+            if node.body:
+                try:
+                    v = yield (node.body, frame)
+                except RewindBreak as brk:
+                    return brk.value
+                except RewindContinue as cnt:
+                    v = cnt.value
+                if ctx.completion and NSECompletion.loop(ctx):
+                    return v
+        return v
+    
+NSESteppers.steppers = _steppers
+del _steppers
+
+class NSEInlineCache:
+    """
+    Remembers the trait method or class member resolved at a call site for the last seen value type
+    """
+    
+    type    : Optional[NSValue]
+    version : int
+    method  : Optional[Union[NSFunction,NSValue]]
+    
+    __slots__ = ('type','version','method')
+    
+    def __init__( self ):
+        self.type = None
+        self.version = -1
+        self.method = None
         
-    def __init__(self, root_frame: NSEFrame):
-        self.root_frame = root_frame
+    def get_trait_method( self, value: NSValue, trait: NSValue, name: str ) -> Optional[NSFunction]:
+        t = value.type
+        if t is self.type and self.version == NSValue.trait_version:
+            return self.method
+        method = value.get_trait_method(trait, name)
+        # Only values of an NSValue class resolve their traits through their type
+        if isinstance(t,NSValue):
+            self.type = t
+            self.version = NSValue.trait_version
+            self.method = method
+        return method
+    
+    def get_member( self, value: NSValue, prop: str ) -> NSValue:
+        t = value.type
+        if t is self.type and self.version == NSValue.trait_version:
+            return self.method
+        member = value.get(prop,False,True)
+        # Class members only change when a trait gets implemented
+        if isinstance(t,NSValue):
+            self.type = t
+            self.version = NSValue.trait_version
+            self.method = member
+        return member
     
-    def exec(self, node: ns.Node, frame: NSEFrame, attempt_copy: bool = True) -> NSValue:
+    @staticmethod
+    def of( node: ns.Node ) -> 'NSEInlineCache':
+        try:
+            return node._nse_cache
+        except AttributeError:
+            c = node._nse_cache = NSEInlineCache()
+            return c
+    
+    @staticmethod
+    def compound( node: ns.Node ) -> 'NSEInlineCache':
+        """
+        Cache of the assignment trait of a compound assignment, the plain operator it falls back to uses the one of the node
+        """
+        try:
+            return node._nse_compound_cache
+        except AttributeError:
+            c = node._nse_compound_cache = NSEInlineCache()
+            return c
+
+class NSEDescriptor:
+    """
+    Execution metadata of a node, computed once on its first visit
+    """
+    
+    executor  : NSEExecutor
+    scope     : bool
+    decorated : bool
+    
+    __slots__ = ('executor','scope','decorated')
+    
+    def __init__( self, node: ns.Node ):
         e = NSEExecutors.executors.get(type(node))
         if not e:
             raise ValueError('Unsupported node type `%s`'%(type(node).__name__,))
         if isinstance(e,type):
             raise ValueError('Legacy node executor for `%s`'%(type(node).__name__))
-        if e == NSEExecutors.Block:
-            frame = frame()
-        env = {
-            'result': None,
-            'copy': None,
-        }
-        if isinstance(node,ns.DecoratableNode):
+        self.executor = e
+        self.scope = e == NSEExecutors.Block
+        self.decorated = isinstance(node,ns.DecoratableNode) and len(node.get_decorators()) > 0
+        
+    @staticmethod
+    def of( node: ns.Node ) -> 'NSEDescriptor':
+        try:
+            return node._nse_descriptor
+        except AttributeError:
+            d = node._nse_descriptor = NSEDescriptor(node)
+            return d
+
+class NSEContext:    
+    
+    root_frame : NSEFrame
+    completion : int
+    stack      : bool
+    # TODO: Add trace
+        
+    def __init__(self, root_frame: NSEFrame, stack: bool = False):
+        self.root_frame = root_frame
+        self.completion = NSECompletion.Normal
+        self.stack = stack
+    
+    def exec(self, node: ns.Node, frame: NSEFrame) -> NSValue:
+        try:
+            d = node._nse_descriptor
+        except AttributeError:
+            d = NSEDescriptor.of(node)
+        if d.scope:
+            frame = frame(None,node)
+        if d.decorated:
+            env = {
+                'result': None,
+            }
             apply_decorators_pre(self, frame, node, env)
-        env['result'] = e(node,frame,self)
-        if isinstance(node,ns.DecoratableNode):
+            result = d.executor(node,frame,self)
+            # The decorators assign into the result, which must not be shared with other slots
+            env['result'] = util.own(self, frame, result) if result.owned is NSValue.POOLED else result
             apply_decorators_post(self, frame, node, env, env['result'])
-        if not attempt_copy if env['copy'] == None else env['copy']:
             return env['result']
-        return util.copy(self, frame, env['result'])
+        return d.executor(node,frame,self)
+    
+    def run(self, node: ns.Node, frame: NSEFrame) -> NSValue:
+        """
+        Evaluates a node keeping pending evaluations on a heap allocated stack instead of the Python one
+        """
+        steps = self.steps(node, frame)
+        try:
+            request = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        steps.close()
+        raise NSEException.fromNode('Cannot yield outside of a generator function body',request.node)
+    
+    def generate(self, node: ns.Node, frame: NSEFrame) -> Generator[NSValue,None,None]:
+        """
+        Evaluates the body of a generator function, suspending its stack at each `yield` until the next item is pulled
+        """
+        try:
+            for request in self.steps(node, frame):
+                yield request.value
+        except RewindReturn:
+            pass
+        self.completion = NSECompletion.Normal
+    
+    def steps(self, node: ns.Node, frame: NSEFrame) -> Generator[NSEYield,None,NSValue]:
+        """
+        Drives the explicit stack, handing out the values reaching a `yield`
+        """
+        stack = [NSESteppers.root(node, frame)]
+        calls = []
+        value = None
+        error = None
+        while True:
+            if calls and calls[-1] == len(stack)-1:
+                calls.pop()
+            try:
+                request = stack[-1].throw(error) if error != None else stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value, error = stop.value, None
+                continue
+            except BaseException as e:
+                stack.pop()
+                if not stack:
+                    raise
+                value, error = None, e
+                continue
+            value, error = None, None
+            
+            if type(request) is NSEYield:
+                yield request
+                continue
+            if type(request) is NSETail:
+                # Everything above the innermost pending call completes with the tail call anyway
+                if calls:
+                    del stack[calls[-1]+1:]
+                value = request
+                continue
+            
+            node, frame = request[0], request[1]
+            try:
+                d = node._nse_descriptor
+            except AttributeError:
+                d = NSEDescriptor.of(node)
+            stepper = NSESteppers.steppers.get(type(node)) if not d.decorated else None
+            if stepper == None:
+                try:
+                    value = self.exec(node, frame)
+                except BaseException as e:
+                    error = e
+                continue
+            if len(request) > 2:
+                calls.append(len(stack)-1)
+            if d.scope:
+                frame = frame(None,node)
+            stack.append(stepper(node, frame, self))
     
 def toNSString(ctx: NSEContext, frame: NSEFrame, v:NSValue, h:bool=True, rep:bool=False) -> str:
-    if v.type == NSKind.Null:
+    if v.type is NSKind.Null:
         return 'null'
-    elif v.type == NSKind.Ref:
+    elif v.type is NSKind.Ref:
         return '&'+toNSString(ctx,frame,v.data,rep=True)
-    elif v.type == NSKind.Class:
+    elif v.type is NSKind.Class:
         cls = v.data.get('__class',{}).get('class',None)
         return '<class %s>'%(cls.__name__) if cls else repr(v)
-    elif v.type == NSKind.Trait:
+    elif v.type is NSKind.Trait:
         return '<trait>'
-    elif v.type == NSTypes.String:
-        return repr(v.data) if rep else v.data
-    elif v.type == NSTypes.Number:
+    elif v.type is NSTypes.String:
+        return repr(str(v.data)) if rep else str(v.data)
+    elif v.type is NSTypes.Number:
         return str(int(v.data)) if int(v.data) == v.data else str(v.data)
-    elif v.type == NSTypes.Boolean:
+    elif v.type is NSTypes.Boolean:
         return ('false','true')[v.data]
-    elif v.type == NSTypes.Array:
+    elif v.type is NSTypes.Array:
         return '['+', '.join(toNSString(ctx,frame,v,rep=True) for v in v.data['items'])+']'
     elif h:
         toString = v.get_trait_method(NSTraits.ToString,'toString')
         if toString:
-            r = toString.call(ctx,frame,NSFunction.Arguments([],{},toString,v))
-            if isinstance(r,NSValue) and r.type == NSTypes.String:
+            r = toString.invoke(ctx,frame,v,[])
+            if isinstance(r,NSValue) and r.type is NSTypes.String:
                 return toNSString(ctx, frame, r, False)
     cls = v.type.data.get('__class',{}).get('class',None)
     return '<%s @%s>'%(cls.__name__,hex(id(v))[2:]) if cls else repr(v)
     
-@NSValue.Function
-def ns_print(ctx: NSEContext, frame: NSEFrame, args: NSFunction.Arguments) -> NSValue:
+@NSValue.Native
+def ns_print(ctx: NSEContext, frame: NSEFrame, bound: Optional[NSValue], args: list[NSValue]) -> NSValue:
     s = ''
-    for i, v in enumerate(args.args):
+    for i, v in enumerate(args):
         s += toNSString(ctx, frame, v, True)
-        if i < len(args.args)-1:
+        if i < len(args)-1:
             s += ' '
     print(s)
     return NULL()
@@ -1230,9 +3019,41 @@ GATE_NAND = 3
 GATE_NOR  = 4
 GATE_NXOR = 5
     
+@NSValue.Native
+def ns_map(ctx: NSEContext, frame: NSEFrame, bound: Optional[NSValue], args: list[NSValue]) -> NSValue:
+    if len(args) > 1 or (len(args) and args[0].type is not NSTypes.Array):
+        raise FunctionException('Expected an optional array of [key, value] pairs')
+    value = NSTypes.Map.instantiate()
+    entries = value.data['entries']
+    for pair in (args[0].data['items'] if len(args) else ()):
+        if pair.type is not NSTypes.Array or len(pair.data['items']) != 2:
+            raise FunctionException('Expected an array of [key, value] pairs')
+        key, item = pair.data['items']
+        entries[util.key(ctx, frame, key)] = (util.own(ctx, frame, key), util.own(ctx, frame, item))
+    return value
+    
+@NSValue.Native
+def ns_range(ctx: NSEContext, frame: NSEFrame, bound: Optional[NSValue], args: list[NSValue]) -> NSValue:
+    if not 1 <= len(args) <= 3:
+        raise FunctionException('Expected 1 to 3 arguments, got %d'%(len(args),))
+    bounds = []
+    for i, arg in enumerate(args):
+        if arg.type is NSKind.Null and i == min(1, len(args)-1):
+            bounds.append(None)
+        elif arg.type is not NSTypes.Number or not math.isfinite(arg.data) or int(arg.data) != arg.data:
+            raise FunctionException('Invalid argument #%d, expected an integer'%(i+1,))
+        else:
+            bounds.append(int(arg.data))
+    start, stop, step = ([0] + bounds + [1])[-3:] if len(bounds) == 1 else (bounds + [1])[:3]
+    if step == 0:
+        raise FunctionException('Step must not be zero')
+    # A null stop leaves the range unbounded
+    items = itertools.count(start, step) if stop == None else range(start, stop, step)
+    return NSTypes.Stream.instantiate(map(NSValue.Number, items))
+    
 def gate_generator( variant ):
-    @NSValue.Function
-    def gate(ctx: NSEContext, frame: NSEFrame, args: NSFunction.Arguments) -> NSValue:
+    @NSValue.Native
+    def gate(ctx: NSEContext, frame: NSEFrame, bound: Optional[NSValue], args: list[NSValue]) -> NSValue:
         return NSTypes.Logic.instantiate(variant)
     return gate
     
@@ -1246,10 +3067,10 @@ def export(ctx: NSEContext, frame: NSEFrame, value: NSValue, args: list[NSValue]
     if name:
         ctx.root_frame.vars.new(name, value)
     
-@NSValue.Function
-def require(ctx: NSEContext, frame: NSEFrame, args: NSFunction.Arguments) -> NSValue:
+@NSValue.Native
+def require(ctx: NSEContext, frame: NSEFrame, bound: Optional[NSValue], args: list[NSValue]) -> NSValue:
     _check_called_with(args, (NSTypes.String,))
-    found, comp = exec_file(pathlib.Path(args.args[0].data).resolve()).frame.vars.get('component')
+    found, comp = load_module(pathlib.Path(str(args[0].data)).resolve(),exec_file).frame.vars.get('component')
     if not found:
         raise FunctionException('Could not retreive component from required file')
     return comp
@@ -1266,8 +3087,15 @@ globals = NSEVars({
     'false': FALSE(),
     'null': NULL(),
     'export': export,
-    'require': require
+    'require': require,
+    'range': ns_range,
+    'Map': ns_map,
+    'Float64Array': NSTypes.Float64Array.data['__class']['create'],
+    'Int64Array': NSTypes.Int64Array.data['__class']['create']
 },True)
+for v in globals.vars.values():
+    if not v.owned:
+        v.owned = True
 
 class ExecutionResult:
     
@@ -1280,12 +3108,15 @@ def exec_code( root: ns.NodeBlock, locals: dict = None ) -> ExecutionResult:
 
     root_frame = NSEFrame(globals.extend(locals or {}),None)
 
-    context = NSEContext(root_frame)
+    context = NSEContext(root_frame,stack_mode)
     try:
-        context.exec(root,root_frame)
+        if context.stack:
+            context.run(root,root_frame)
+        else:
+            context.exec(root,root_frame)
     except RewindReturn as ret:
         if ret.value:
-            if ret.value.type == NSTypes.Number:
+            if ret.value.type is NSTypes.Number:
                 exit(int(ret.value.data))
         exit(0)
     except RewindBreak:
@@ -1313,16 +3144,59 @@ def exec_file( path: str ) -> Union[ExecutionResult,NSEException,ns.ParseError]:
     component = NSTypes.Component.instantiate()
     @NSValue.BasicDecorator
     def cp_input(ctx: NSEContext, frame: NSEFrame, value: NSValue, args: list[NSValue], node: ns.DecoratableNode, dec: ns.NodeDecorator):
-        component.props['inputs'].data['items'].append(value)
+        component.get('inputs').data['items'].append(value)
     @NSValue.BasicDecorator
     def cp_output(ctx: NSEContext, frame: NSEFrame, value: NSValue, args: list[NSValue], node: ns.DecoratableNode, dec: ns.NodeDecorator):
-        component.props['outputs'].data['items'].append(value)
+        component.get('outputs').data['items'].append(value)
     return exec_code(tree,{
         'component': component,
         'input': cp_input,
         'output': cp_output
     })
 
+def import_module( path: pathlib.Path ) -> NSValue:
+    source = ns.Source.fromFile(path)
+    tokens = ns.tokenize(source)
+    tree = ns.parse(tokens)
+    result = exec_code(tree)
+    return NSValue.constant(NSValue(None,NSTypes.Module,result.frame.vars.vars))
+
+modules_cache : dict[tuple[pathlib.Path,Callable],tuple[tuple[int,int],Any]] = {}
+dirs_cache    : dict[pathlib.Path,tuple[int,frozenset[str]]] = {}
+
+def load_module( path: pathlib.Path, loader: Callable[[pathlib.Path],Any] ) -> Any:
+    """
+    Runs a file through the loader once, until the file gets modified
+    """
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns,stat.st_size)
+    cached = modules_cache.get((path,loader))
+    if cached == None or cached[0] != stamp:
+        cached = modules_cache[(path,loader)] = (stamp,loader(path))
+    return cached[1]
+
+def find_module( name: str ) -> Optional[pathlib.Path]:
+    """
+    Looks for a module along the search path, directory listings are kept until the directory changes
+    """
+    file = name+'.ns'
+    for d in searchPath:
+        try:
+            mtime = d.stat().st_mtime_ns
+        except OSError:
+            continue
+        cached = dirs_cache.get(d)
+        if cached == None or cached[0] != mtime:
+            cached = dirs_cache[d] = (mtime,frozenset(os.listdir(d)))
+        if file in cached[1]:
+            return d.joinpath(file).resolve()
+    return None
+
+stack_mode = consume_ns_arg('-stack')
+if len(args) == 0:
+    print('Missing source file')
+    exit(1)
+    
 mainPath = pathlib.Path(args[0]).resolve()
 result = exec_file(mainPath)
 if isinstance(result, ns.ParseError):